@@ -0,0 +1,43 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from accounts.token_cache import token_cache
+
+
+def evict_tokens(user_id, keys, using):
+    """
+    Evict tokens now and again once the transaction commits, since until
+    then concurrent requests still load the old rows from the database.
+    """
+    token_cache.delete_user(user_id, keys)
+    transaction.on_commit(
+        partial(token_cache.delete_user, user_id, keys),
+        using=using,
+    )
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, using, **kwargs):
+    evict_tokens(instance.user_id, [instance.key], using)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def evict_user_tokens(sender, instance, using, **kwargs):
+    """
+    Evict the cached tokens of a user whenever it is saved or deleted, so
+    that deactivation and password changes take effect on the next request.
+    """
+    if kwargs.get("created"):
+        return
+    keys = list(Token.objects.filter(user_id=instance.pk).values_list(
+        "key",
+        flat=True,
+    ))
+    evict_tokens(instance.pk, keys, using)
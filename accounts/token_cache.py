@@ -0,0 +1,118 @@
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from drf_sample.lru import LRUCache
+
+
+class TokenCache:
+    """
+    Two level cache of resolved auth tokens.
+
+    Lookups go to a per-process LRU first and then to Django's cache
+    framework, so most requests authenticate without a database query.
+
+    Each token has a generation, a counter kept in the shared cache and
+    bumped by the signal handlers in `accounts.signals` whenever the token
+    is evicted. Shared entries carry the generation read before the token
+    was loaded from the database, and are only used while it hasn't moved,
+    so a token loaded just before an eviction is never cached past it.
+    Local entries skip that round trip and are only kept for
+    `AUTH_TOKEN_LOCAL_CACHE_TIMEOUT` seconds: an eviction applies to the
+    process making it at once, and to the others within that time.
+
+    Every lookup returns its own copy of the token and user, which the
+    request is free to change.
+    """
+    key_prefix = "auth_token"
+
+    def __init__(self):
+        self.local = LRUCache(
+            max_size=getattr(settings, "AUTH_TOKEN_LOCAL_CACHE_SIZE", 1024),
+            timeout=getattr(settings, "AUTH_TOKEN_LOCAL_CACHE_TIMEOUT", 5),
+        )
+
+    @property
+    def shared(self):
+        return caches[getattr(settings, "AUTH_TOKEN_CACHE_ALIAS", "default")]
+
+    @property
+    def timeout(self):
+        return getattr(settings, "AUTH_TOKEN_CACHE_TIMEOUT", 300)
+
+    def make_key(self, key):
+        return f"{self.key_prefix}:{key}"
+
+    def make_generation_key(self, key):
+        return f"{self.key_prefix}_generation:{key}"
+
+    def get_generation(self, key):
+        """
+        Return the generation of a token, to be read before loading it from
+        the database and passed to `set()`.
+        """
+        generation_key = self.make_generation_key(key)
+        generation = self.shared.get(generation_key)
+        if generation is None:
+            # Start from the clock so that a lost counter never comes back
+            # with a generation entries were stamped with
+            self.shared.add(generation_key, time.time_ns(), None)
+            generation = self.shared.get(generation_key)
+        return generation
+
+    def bump_generation(self, key):
+        generation_key = self.make_generation_key(key)
+        try:
+            self.shared.incr(generation_key)
+        except ValueError:
+            self.shared.add(generation_key, time.time_ns(), None)
+
+    def get(self, key):
+        token = self.local.get(key)
+        if token is not None:
+            return copy.deepcopy(token)
+        entry = self.shared.get(self.make_key(key))
+        if entry is None:
+            return None
+        generation, token = entry
+        if generation != self.get_generation(key):
+            return None
+        self.local.set(key, copy.deepcopy(token))
+        return token
+
+    def set(self, token, generation):
+        """
+        Cache a token loaded from the database after reading `generation`,
+        unless it was evicted since.
+        """
+        self.shared.set(
+            self.make_key(token.key),
+            (generation, token),
+            self.timeout,
+        )
+        if generation != self.get_generation(token.key):
+            self.shared.delete(self.make_key(token.key))
+            return
+        self.local.set(token.key, copy.deepcopy(token))
+
+    def delete(self, key):
+        """Evict a token, in every process"""
+        self.bump_generation(key)
+        self.shared.delete(self.make_key(key))
+        self.local.delete(key)
+
+    def delete_user(self, user_id, keys=()):
+        """Evict every cached token of the given user, in every process"""
+        for key in keys:
+            self.bump_generation(key)
+        self.shared.delete_many([self.make_key(key) for key in keys])
+        self.local.delete_matching(lambda token: token.user_id == user_id)
+
+    def clear_local(self):
+        """Drop the entries held by this process"""
+        self.local.clear()
+
+
+token_cache = TokenCache()
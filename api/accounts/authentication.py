@@ -0,0 +1,26 @@
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from accounts.token_cache import token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for `TokenAuthentication` that resolves tokens
+    through `accounts.token_cache` before falling back to the database.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            # Read before the token, so that an eviction in between is seen
+            generation = token_cache.get_generation(key)
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(token, generation)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        return (token.user, token)
@@ -3,8 +3,10 @@ from django.utils.translation import gettext_lazy as _
 
 from rest_framework import serializers
 
+from drf_sample.metrics import TimedSerializerMixin
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = (
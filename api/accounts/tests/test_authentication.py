@@ -0,0 +1,163 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from accounts.token_cache import TokenCache, token_cache
+from recipes.models import Recipe
+
+USER_ME = reverse("api_v1:accounts_me")
+RECIPES_URL = reverse("api_v1:recipe-list")
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        token_cache.clear_local()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com",
+            password="simple",
+            name="test name",
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_token_resolved_from_cache(self):
+        res = self.client.get(USER_ME)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(USER_ME)
+        self.assertEqual(res.data["email"], self.user.email)
+
+    def test_token_resolved_from_shared_cache(self):
+        """Test another process finds the token in Django's cache"""
+        self.client.get(USER_ME)
+        token_cache.clear_local()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(USER_ME)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_used_by_recipe_endpoints(self):
+        self.client.get(RECIPES_URL)
+        Recipe.objects.create(
+            user=self.user,
+            title="recipe",
+            time_minutes=5,
+            price=5.00,
+        )
+
+        # recipes list and its two prefetches, no token lookup
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        res = self.client.get(USER_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_evicted(self):
+        self.client.get(USER_ME)
+        self.token.delete()
+
+        res = self.client.get(USER_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_evicted(self):
+        self.client.get(USER_ME)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(USER_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_evicted(self):
+        self.client.get(USER_ME)
+        self.user.delete()
+
+        res = self.client.get(USER_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_eviction_applies_to_other_processes(self):
+        self.client.get(USER_ME)
+        other_process = TokenCache()
+
+        # Deactivation handled by another process, with its own LRU
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False,
+        )
+        other_process.delete_user(self.user.pk, [self.token.key])
+        # Once the local entry has expired
+        token_cache.clear_local()
+        res = self.client.get(USER_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_deletion_applies_to_other_processes(self):
+        self.client.get(USER_ME)
+        other_process = TokenCache()
+
+        Token.objects.filter(pk=self.token.pk).delete()
+        other_process.delete(self.token.key)
+        token_cache.clear_local()
+        res = self.client.get(USER_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_eviction_during_lookup_not_cached(self):
+        """Test a token loaded just before an eviction isn't cached"""
+        authenticate = TokenAuthentication.authenticate_credentials
+
+        def deactivate_after_lookup(auth, key):
+            result = authenticate(auth, key)
+            get_user_model().objects.filter(pk=self.user.pk).update(
+                is_active=False,
+            )
+            TokenCache().delete_user(self.user.pk, [key])
+            return result
+
+        with patch.object(
+            TokenAuthentication,
+            "authenticate_credentials",
+            deactivate_after_lookup,
+        ):
+            self.client.get(USER_ME)
+        token_cache.clear_local()
+
+        res = self.client.get(USER_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_lookups_return_copies(self):
+        self.client.get(USER_ME)
+
+        token = token_cache.get(self.token.key)
+        token.user.name = "changed"
+
+        self.assertIsNot(token_cache.get(self.token.key), token)
+        self.assertEqual(
+            token_cache.get(self.token.key).user.name,
+            "test name",
+        )
+
+    def test_password_change_evicts_user(self):
+        self.client.get(USER_ME)
+
+        res = self.client.patch(USER_ME, {"password": "new_password"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertIsNone(token_cache.get(self.token.key))
@@ -0,0 +1,129 @@
+"""
+Async read path for the hot endpoints of the API, served under ASGI.
+
+Under ASGI Django 3.2 runs sync views, and every sync middleware, through
+`sync_to_async` on one shared thread, so requests are served one at a
+time. `AsyncReadASGIHandler` keeps the event loop for the I/O and hands
+GET and HEAD requests to the routes in `ASYNC_READ_ROUTES` to a pool of
+`ASYNC_READ_WORKERS` threads instead. Each worker runs the whole sync
+request pipeline (middleware, authentication, querying, serialization and
+rendering), since Django's ORM can't be awaited, and the event loop only
+waits on the result. Every other request goes through Django's usual
+thread-sensitive path.
+
+Django iterates streamed responses on the event loop itself, which the
+export can't take: its rows are queried as the body is iterated. The
+handler pulls each part of a streamed body through `sync_to_async` on the
+thread-sensitive thread that ran the view instead, so the query keeps to
+that thread's connection.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.base import BaseHandler
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+
+ASYNC_READ_ROUTES = {
+    "recipe-list",
+    "recipe-detail",
+    "tag-list",
+    "ingredient-list",
+    "accounts_me",
+}
+READ_METHODS = ("GET", "HEAD")
+_END = object()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ASYNC_READ_WORKERS", 8),
+                thread_name_prefix="async-read",
+            )
+        return _executor
+
+
+def is_async_read(request):
+    if request.method not in READ_METHODS:
+        return False
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+    return match.url_name in ASYNC_READ_ROUTES
+
+
+def _run_read(get_response, request):
+    # Pool threads own their connections; treat each call like a request so
+    # CONN_MAX_AGE and broken connections are handled as usual.
+    close_old_connections()
+    try:
+        return get_response(request)
+    finally:
+        close_old_connections()
+
+
+class AsyncReadASGIHandler(ASGIHandler):
+    """ASGI handler serving the hot reads from the read pool"""
+
+    def __init__(self):
+        super().__init__()
+        # A sync middleware chain, for use from the pool threads
+        self.read_handler = BaseHandler()
+        self.read_handler.load_middleware()
+
+    async def get_response_async(self, request):
+        if not is_async_read(request):
+            return await super().get_response_async(request)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_executor(),
+            partial(_run_read, self.read_handler.get_response, request),
+        )
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (
+                header.encode("ascii") if isinstance(header, str) else header,
+                value.encode("latin1") if isinstance(value, str) else value,
+            )
+            for header, value in response.items()
+        ]
+        headers.extend(
+            (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+            for cookie in response.cookies.values()
+        )
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": headers,
+        })
+        parts = await sync_to_async(iter, thread_sensitive=True)(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        try:
+            while True:
+                part = await next_part(parts, _END)
+                if part is _END:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": True,
+                    })
+            await send({"type": "http.response.body"})
+        finally:
+            await sync_to_async(response.close, thread_sensitive=True)()
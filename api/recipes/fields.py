@@ -0,0 +1,102 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+
+
+class BatchedManyRelatedField(ManyRelatedField):
+    """
+    Resolve all submitted primary keys with one `IN` query and report every
+    missing id in a single error.
+
+    Resolved objects are remembered for the lifetime of the field, so a
+    list serializer validating many items only looks up each id once.
+    """
+    default_error_messages = {
+        "does_not_exist": _(
+            'Invalid pk(s) "{pk_values}" - object(s) do not exist.'
+        ),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._resolved = {}
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for item in data:
+            if child.pk_field is not None:
+                item = child.pk_field.to_internal_value(item)
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                pks.append(pk_field.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                child.fail("incorrect_type", data_type=type(item).__name__)
+        pks = list(dict.fromkeys(pks))
+
+        unresolved = [pk for pk in pks if pk not in self._resolved]
+        if unresolved:
+            self._resolved.update(queryset.in_bulk(unresolved))
+        missing = [pk for pk in pks if pk not in self._resolved]
+        if missing:
+            self.fail(
+                "does_not_exist",
+                pk_values=", ".join(str(pk) for pk in missing),
+            )
+        return [self._resolved[pk] for pk in pks]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field limited to objects owned by the requesting user.
+
+    With `many=True` the ids are validated by `BatchedManyRelatedField`.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get("request")
+        if request is None:
+            return queryset.none()
+        return queryset.filter(user=request.user)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
+
+
+class ImageVariantsField(serializers.Field):
+    """Read-only field listing the stored image variants with their URL"""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        variants = {}
+        for name, variant in value.items():
+            url = default_storage.url(variant["path"])
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            variants[name] = {
+                "url": url,
+                "width": variant["width"],
+                "height": variant["height"],
+            }
+        return variants
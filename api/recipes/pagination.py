@@ -0,0 +1,156 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque cursor pagination over ``(<ordering field>, id)``.
+
+    Each page is fetched with a range condition on the last seen key instead
+    of an OFFSET, and no COUNT(*) is issued, so deep pages cost the same as
+    the first one.
+    """
+    # Field to order by, prefixed with "-" for descending order. The primary
+    # key is always used as a tie-breaker in the same direction.
+    ordering = None
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    invalid_cursor_message = _("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(view)
+        self.field = ordering.lstrip("-")
+        self.descending = ordering.startswith("-")
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor[0]
+        # Walking backwards flips the direction of both the filter and the
+        # ordering; the page is reversed again once fetched.
+        descending = self.descending != reverse
+        prefix = "-" if descending else ""
+        queryset = queryset.order_by(f"{prefix}{self.field}", f"{prefix}pk")
+        if self.cursor is not None:
+            _, value, pk = self.cursor
+            queryset = queryset.filter(
+                self._after(value, pk, descending)
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_ordering(self, view):
+        """
+        Views may order some requests differently, e.g. by search rank, by
+        defining `get_keyset_ordering()`.
+        """
+        get_keyset_ordering = getattr(view, "get_keyset_ordering", None)
+        if get_keyset_ordering is not None:
+            return get_keyset_ordering() or self.ordering
+        return self.ordering
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.request.build_absolute_uri(),
+                self.cursor_query_param,
+            )
+        return self.encode_cursor(True, self.page[0])
+
+    def _after(self, value, pk, descending):
+        """
+        Condition selecting the rows that come after ``(value, pk)``.
+
+        Written as a bounded range on the ordering field so that a
+        ``(user, <field>)`` index can be used for the scan.
+        """
+        op = "lt" if descending else "gt"
+        return Q(**{f"{self.field}__{op}e": value}) & (
+            Q(**{f"{self.field}__{op}": value}) | Q(**{f"pk__{op}": pk})
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            reverse, value, pk = json.loads(
+                urlsafe_b64decode(encoded.encode("ascii"))
+            )
+            if not isinstance(value, (str, int, float)):
+                raise TypeError
+            return bool(reverse), value, int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, reverse, instance):
+        position = [int(reverse), getattr(instance, self.field), instance.pk]
+        encoded = urlsafe_b64encode(json.dumps(position).encode("utf-8"))
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encoded.decode("ascii"),
+        )
+
+
+class TitleKeysetPagination(KeysetPagination):
+    ordering = "-title"
+
+
+class NameKeysetPagination(KeysetPagination):
+    ordering = "-name"
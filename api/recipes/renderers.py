@@ -0,0 +1,47 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """JSON renderer that can also write a JSON array batch by batch"""
+
+    def stream(self, batches):
+        """Yield one chunk of a JSON array for every batch of items"""
+        yield b"["
+        first = True
+        for batch in batches:
+            if not batch:
+                continue
+            chunk = self.render(batch)[1:-1]
+            yield chunk if first else b"," + chunk
+            first = False
+        yield b"]"
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline delimited JSON, one item per line"""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def dumps(self, item):
+        return json.dumps(
+            item,
+            cls=JSONEncoder,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8") + b"\n"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, list):
+            return b"".join(self.dumps(item) for item in data)
+        return self.dumps(data)
+
+    def stream(self, batches):
+        for batch in batches:
+            if batch:
+                yield self.render(batch)
@@ -1,31 +1,163 @@
+from collections import Counter, OrderedDict
+from itertools import chain
+
+from django.db import connections, router, transaction
+
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 
+from drf_sample.metrics import TimedSerializerMixin
+from recipes.cache import bump_user_version_on_write
 from recipes.models import Tag, Ingredient, Recipe
+from api.recipes.fields import ImageVariantsField, UserPrimaryKeyRelatedField
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
-        fields = ("id", "name")
-        read_only_fields = ("id",)
+        fields = ("id", "name", "recipe_count")
+        read_only_fields = ("id", "recipe_count")
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
-        fields = ("id", "name")
-        read_only_fields = ("id",)
+        fields = ("id", "name", "recipe_count")
+        read_only_fields = ("id", "recipe_count")
+
+
+class SparseFieldsetMixin:
+    """
+    Let GET requests pick the serialized fields with `?fields=a,b` and/or
+    `?omit=c`. Unknown names are ignored.
+    """
+
+    @staticmethod
+    def _field_list(value):
+        return {name.strip() for name in value.split(",") if name.strip()}
+
+    @classmethod
+    def select_fields(cls, query_params):
+        """Return the names of `Meta.fields` requested by `query_params`"""
+        names = list(cls.Meta.fields)
+        if query_params.get("fields"):
+            wanted = cls._field_list(query_params["fields"])
+            names = [name for name in names if name in wanted]
+        if query_params.get("omit"):
+            omitted = cls._field_list(query_params["omit"])
+            names = [name for name in names if name not in omitted]
+        return names
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+        selected = set(self.select_fields(request.query_params))
+        return OrderedDict(
+            (name, field) for name, field in fields.items()
+            if name in selected
+        )
+
+
+class RecipeRangeFilterSerializer(serializers.Serializer):
+    """Query parameters bounding the price and time of listed recipes"""
+    LOOKUPS = {
+        "min_price": "price__gte",
+        "max_price": "price__lte",
+        "min_time": "time_minutes__gte",
+        "max_time": "time_minutes__lte",
+    }
+
+    min_price = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        required=False,
+    )
+    max_price = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        required=False,
+    )
+    min_time = serializers.IntegerField(required=False)
+    max_time = serializers.IntegerField(required=False)
+
+    def get_filters(self):
+        """Return the validated bounds as queryset lookups"""
+        return {
+            self.LOOKUPS[name]: value
+            for name, value in self.validated_data.items()
+        }
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Create many recipes with a handful of batched INSERTs"""
+
+    def create(self, validated_data):
+        recipes = []
+        tag_ids = []
+        ingredient_ids = []
+        for attrs in validated_data:
+            attrs = dict(attrs)
+            tag_ids.append(dict.fromkeys(tag.pk for tag in attrs.pop("tags", [])))
+            ingredient_ids.append(dict.fromkeys(
+                ingredient.pk for ingredient in attrs.pop("ingredients", [])
+            ))
+            recipes.append(Recipe(**attrs))
+
+        db = router.db_for_write(Recipe)
+        with transaction.atomic(using=db):
+            if connections[db].features.can_return_rows_from_bulk_insert:
+                Recipe.objects.using(db).bulk_create(recipes)
+            else:
+                # The backend can't report the new primary keys of a bulk
+                # insert, so the recipes themselves go in one by one.
+                for recipe in recipes:
+                    recipe.save(using=db)
+
+            RecipeTag = Recipe.tags.through
+            RecipeTag.objects.using(db).bulk_create([
+                RecipeTag(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe, ids in zip(recipes, tag_ids)
+                for tag_id in ids
+            ])
+            RecipeIngredient = Recipe.ingredients.through
+            RecipeIngredient.objects.using(db).bulk_create([
+                RecipeIngredient(
+                    recipe_id=recipe.pk,
+                    ingredient_id=ingredient_id,
+                )
+                for recipe, ids in zip(recipes, ingredient_ids)
+                for ingredient_id in ids
+            ])
+            Tag.objects.using(db).add_recipe_counts(
+                Counter(chain.from_iterable(tag_ids))
+            )
+            Ingredient.objects.using(db).add_recipe_counts(
+                Counter(chain.from_iterable(ingredient_ids))
+            )
+
+        # bulk_create doesn't send the signals that keep recipe counts and
+        # cached lists fresh
+        for user_id in {recipe.user_id for recipe in recipes}:
+            bump_user_version_on_write(user_id, db)
+        return recipes
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    ingredients = serializers.PrimaryKeyRelatedField(
+class RecipeSerializer(
+    TimedSerializerMixin,
+    SparseFieldsetMixin,
+    serializers.ModelSerializer,
+):
+    ingredients = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all(),
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all(),
     )
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -37,13 +169,21 @@ class RecipeSerializer(serializers.ModelSerializer):
             "link",
             "ingredients",
             "tags",
+            "image_status",
+            "image_variants",
         )
-        read_only_fields = ("id",)
+        read_only_fields = ("id", "image_status")
+        list_serializer_class = RecipeListSerializer
 
 
-class RecipeDetailSerializer(serializers.ModelSerializer):
+class RecipeDetailSerializer(
+    TimedSerializerMixin,
+    SparseFieldsetMixin,
+    serializers.ModelSerializer,
+):
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -55,14 +195,19 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
             "link",
             "ingredients",
             "tags",
+            "image_status",
+            "image_variants",
         )
         read_only_field = ("id",)
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for uploading image to recipes"""
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ("id", "image")
-        read_only_fields = ("id",)
+        fields = ("id", "image", "image_status", "image_variants")
+        read_only_fields = ("id", "image_status")
+        # The model allows recipes without an image, uploads don't
+        extra_kwargs = {"image": {"required": True, "allow_null": False}}
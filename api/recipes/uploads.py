@@ -0,0 +1,134 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    SkipFile,
+    TemporaryFileUploadHandler,
+)
+from django.http import QueryDict
+from django.template.defaultfilters import filesizeformat
+from django.utils.datastructures import MultiValueDict
+from django.utils.translation import gettext as _
+from PIL import Image
+
+# Leading bytes of the image formats we accept
+IMAGE_SIGNATURES = (
+    b"\xff\xd8\xff",  # JPEG
+    b"\x89PNG\r\n\x1a\n",
+    b"GIF87a",
+    b"GIF89a",
+)
+# Room for the multipart framing around the file in the request body
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+def is_image_header(header):
+    if header.startswith(IMAGE_SIGNATURES):
+        return True
+    return header[:4] == b"RIFF" and header[8:12] == b"WEBP"
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream an uploaded image to a temporary file, rejecting it as early as
+    possible.
+
+    Uploads are refused before the body is read when the declared length is
+    over the size cap, and after the first chunk when the file doesn't start
+    like an image. Dimensions are read from the header with Pillow's lazy
+    `Image.open`, so decompression bombs are refused without decoding any
+    pixels. The reason for a rejection is left in `error`.
+    """
+    header_size = 32 * 1024
+
+    def __init__(self, request=None, max_size=None, max_pixels=None):
+        super().__init__(request)
+        self.max_size = max_size or getattr(
+            settings, "RECIPE_IMAGE_MAX_UPLOAD_SIZE", 10 * 1024 * 1024
+        )
+        self.max_pixels = max_pixels or getattr(
+            settings, "RECIPE_IMAGE_MAX_PIXELS", 40_000_000
+        )
+        self.error = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            self.error = self.too_large_message()
+            # Skip parsing, and reading, the request body altogether
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = b""
+        self.header_checked = False
+        self.dimensions_checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.reject(self.too_large_message())
+
+        if not self.header_checked:
+            missing = self.header_size - len(self.header)
+            if missing > 0:
+                self.header += raw_data[:missing]
+            if len(self.header) >= 12 and not is_image_header(self.header):
+                self.reject(self.invalid_image_message())
+            if len(self.header) >= self.header_size:
+                # Once: a header too short to tell is left to file_complete
+                self.header_checked = True
+                self.check_dimensions(BytesIO(self.header), partial=True)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        try:
+            if not is_image_header(self.header):
+                self.reject(self.invalid_image_message())
+            if not self.dimensions_checked:
+                self.check_dimensions(uploaded.file)
+        except SkipFile:
+            return None
+        uploaded.seek(0)
+        return uploaded
+
+    def check_dimensions(self, file, partial=False):
+        """
+        Read the image size from `file` without decoding it. A `partial`
+        header that is too short to tell is checked again once complete.
+        """
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.reject(self.too_many_pixels_message())
+        except (OSError, SyntaxError, ValueError):
+            if partial:
+                return
+            self.reject(self.invalid_image_message())
+
+        self.dimensions_checked = True
+        if width * height > self.max_pixels:
+            self.reject(self.too_many_pixels_message())
+
+    def reject(self, message):
+        self.error = message
+        self.file.close()
+        raise SkipFile(message)
+
+    def too_large_message(self):
+        return _("Upload a file smaller than %(size)s.") % {
+            "size": filesizeformat(self.max_size),
+        }
+
+    def invalid_image_message(self):
+        return _(
+            "Upload a valid image. The file you uploaded was either not an "
+            "image or a corrupted image."
+        )
+
+    def too_many_pixels_message(self):
+        return _("Upload an image with at most %(pixels)s pixels.") % {
+            "pixels": self.max_pixels,
+        }
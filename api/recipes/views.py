@@ -1,39 +1,91 @@
+from decimal import Decimal
+from functools import partial
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import _positive_int
 from rest_framework import viewsets, mixins, status
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from drf_sample.replicas import ReplicaReadMixin
+from recipes import autocomplete, search
+from recipes.facets import count_facets
+from recipes.images import schedule_variants
 from recipes.models import Tag, Ingredient, Recipe
+from recipes.sharding import ShardRoutingMixin
+from api.accounts.authentication import CachedTokenAuthentication
+from api.recipes.caching import VersionedListCacheMixin
+from api.recipes.renderers import NDJSONRenderer, StreamingJSONRenderer
+from api.recipes.pagination import (
+    NameKeysetPagination,
+    TitleKeysetPagination,
+)
+from api.recipes.uploads import ImageUploadHandler
 from api.recipes.serializers import (
     TagSerializer,
     IngredientSerializer,
     RecipeSerializer,
     RecipeDetailSerializer,
     RecipeImageSerializer,
+    RecipeRangeFilterSerializer,
 )
 
 
 class CommonRecipeAttributesClass(
+    ShardRoutingMixin,
+    ReplicaReadMixin,
+    VersionedListCacheMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
 ):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = NameKeysetPagination
+    autocomplete_limit = 10
+    max_autocomplete_limit = 100
 
     def get_queryset(self):
         assigned_only = bool(
             int(self.request.query_params.get("assigned_only", 0))
         )
+        # with_counts=1 is still accepted, but does nothing: recipe_count
+        # is now a column and always serialized
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(user=self.request.user).order_by("-name").distinct()
+            queryset = queryset.assigned()
+        return queryset.filter(user=self.request.user).order_by("-name")
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(methods=["GET"], detail=False)
+    def autocomplete(self, request):
+        """
+        Names starting with `?q=` (case-insensitive), served from an
+        in-memory per-user index.
+        """
+        try:
+            limit = _positive_int(
+                request.query_params.get("limit", self.autocomplete_limit),
+                strict=True,
+                cutoff=self.max_autocomplete_limit,
+            )
+        except ValueError:
+            limit = self.autocomplete_limit
+        return Response(autocomplete.complete(
+            self.queryset.model,
+            request.user.pk,
+            request.query_params.get("q", ""),
+            limit,
+        ))
+
 
 class TagViewSet(CommonRecipeAttributesClass):
     queryset = Tag.objects.all()
@@ -45,11 +97,21 @@ class IngredientViewSet(CommonRecipeAttributesClass):
     serializer_class = IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ShardRoutingMixin,
+    ReplicaReadMixin,
+    VersionedListCacheMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = TitleKeysetPagination
+    max_bulk_create_size = 1000
+    export_batch_size = 500
+    facet_price_width = Decimal("5.00")
+    facet_time_width = 15
 
     @staticmethod
     def _params_to_int(qs):
@@ -58,14 +120,52 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         tags = self.request.query_params.get("tags")
         ingredients = self.request.query_params.get("ingredients")
+        match = self.request.query_params.get("match", "any")
+        if match not in ("any", "all"):
+            raise ValidationError({"match": ['Expected "any" or "all".']})
         queryset = self.queryset
         if tags:
             tag_ids = self._params_to_int(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = queryset.with_related(
+                "tags",
+                tag_ids,
+                match_all=match == "all",
+            )
         if ingredients:
             ingredient_ids = self._params_to_int(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        return queryset.filter(user=self.request.user).order_by("-title")
+            queryset = queryset.with_related(
+                "ingredients",
+                ingredient_ids,
+                match_all=match == "all",
+            )
+        ranges = RecipeRangeFilterSerializer(data=self.request.query_params)
+        ranges.is_valid(raise_exception=True)
+        queryset = queryset.filter(
+            user=self.request.user,
+            **ranges.get_filters(),
+        ).order_by("-title")
+        search_text = self.request.query_params.get("search")
+        if search_text:
+            queryset = search.search(queryset, search_text).order_by(
+                "-search_rank",
+            )
+
+        # Pick the query plan that matches the serializer used by the action,
+        # loading only what the requested fields need
+        if self.action in ("list", "retrieve", "export"):
+            fields = self.get_serializer_class().select_fields(
+                self.request.query_params
+            )
+            if self.action == "retrieve":
+                return queryset.for_detail(fields)
+            return queryset.for_list(fields)
+        return queryset
+
+    def get_keyset_ordering(self):
+        """Searches are paginated by rank rather than by title"""
+        if self.request.query_params.get("search"):
+            return "-search_rank"
+        return None
 
     def get_serializer_class(self):
         """
@@ -83,19 +183,134 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeImageSerializer
         return RecipeSerializer
 
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
+        return super().create(request, *args, **kwargs)
+
+    def bulk_create(self, request):
+        """
+        Create every recipe of a JSON list in one transaction, or none of
+        them. Validation errors are reported by the index of the item.
+        """
+        if len(request.data) > self.max_bulk_create_size:
+            message = (
+                f"Can't create more than {self.max_bulk_create_size} "
+                "recipes at once."
+            )
+            return Response(
+                {"detail": message},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    index: errors
+                    for index, errors in enumerate(serializer.errors)
+                    if errors
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        recipes = self.perform_create(serializer)
+        queryset = Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes]
+        ).for_list().order_by("pk")
+        return Response(
+            self.get_serializer(queryset, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
     def perform_create(self, serializer):
         return serializer.save(user=self.request.user)
 
+    @action(
+        methods=["GET"],
+        detail=False,
+        renderer_classes=(StreamingJSONRenderer, NDJSONRenderer),
+    )
+    def export(self, request):
+        """
+        Stream every recipe of the user as a JSON array, or as NDJSON with
+        `?format=ndjson`, without holding the whole result in memory.
+
+        Rows are read through a chunked (server-side on PostgreSQL) cursor
+        and serialized one batch at a time, with the related ids prefetched
+        per batch.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        # The body is streamed after the request's routing is reset
+        queryset = queryset.using(queryset.db)
+        lookups = queryset._prefetch_related_lookups
+        rows = queryset.prefetch_related(None).iterator(
+            chunk_size=self.export_batch_size
+        )
+
+        def batches():
+            while True:
+                batch = list(islice(rows, self.export_batch_size))
+                if not batch:
+                    return
+                prefetch_related_objects(batch, *lookups)
+                yield self.get_serializer(batch, many=True).data
+
+        renderer = request.accepted_renderer
+        return StreamingHttpResponse(
+            renderer.stream(batches()),
+            content_type=renderer.media_type,
+        )
+
+    @action(methods=["GET"], detail=False)
+    def facets(self, request):
+        """
+        Per-tag and per-ingredient counts, and price and time histograms,
+        over the recipes matching the same filters as the list.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.cached_response(request, lambda: Response(count_facets(
+            queryset,
+            self.facet_price_width,
+            self.facet_time_width,
+        )))
+
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
         recipe = self.get_object()
+        # Must be in place before request.data parses the body
+        upload_handler = ImageUploadHandler(request._request)
+        request._request.upload_handlers = [upload_handler]
         serializer = self.get_serializer(
             recipe,
             data=request.data
         )
+        if upload_handler.error:
+            return Response(
+                {"image": [upload_handler.error]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         if serializer.is_valid():
-            serializer.save()
+            replaced = [
+                variant["path"] for variant in recipe.image_variants.values()
+            ]
+            # Variants are generated off the request thread once the new
+            # image is committed; until then the recipe reports "pending".
+            recipe = serializer.save(
+                image_status=Recipe.ImageStatus.PENDING,
+                image_variants={},
+            )
+            db = recipe._state.db
+            transaction.on_commit(
+                partial(
+                    schedule_variants,
+                    recipe.pk,
+                    using=db,
+                    replaced=replaced,
+                ),
+                using=db,
+            )
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -3,14 +3,21 @@ ASGI config for drf_sample project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The hot read endpoints are served from a thread pool without blocking the
+event loop, see ``api.asgi``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 # os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drf_sample.settings')
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drf_sample.settings.dev')
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from api.asgi import AsyncReadASGIHandler  # noqa: E402
+
+application = AsyncReadASGIHandler()
@@ -0,0 +1,52 @@
+"""
+Cache configuration check.
+
+The token cache, the recipe data versions and the replica pins are read on
+nearly every request and only hold across worker processes if they all
+share one cache. That cache must be an in-memory service such as
+Memcached: a per-process cache serves stale data to the other workers,
+and the database cache turns every lookup into a query on the primary,
+and doesn't increment atomically. `check_shared_caches` rejects both
+unless `REQUIRE_SHARED_CACHES` is off, as it is under test.
+"""
+from django.conf import settings
+from django.core import checks
+
+# Settings naming the caches every worker process must share
+SHARED_CACHE_SETTINGS = (
+    "AUTH_TOKEN_CACHE_ALIAS",
+    "RECIPES_CACHE_ALIAS",
+    "REPLICA_PIN_CACHE_ALIAS",
+)
+
+UNSUITABLE_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache": (
+        "keeps its entries in each process"
+    ),
+    "django.core.cache.backends.dummy.DummyCache": "doesn't keep anything",
+    "django.core.cache.backends.db.DatabaseCache": (
+        "queries the database on every lookup"
+    ),
+}
+
+
+def check_shared_caches(app_configs, **kwargs):
+    if not getattr(settings, "REQUIRE_SHARED_CACHES", True):
+        return []
+    aliases = sorted({
+        getattr(settings, name, "default") for name in SHARED_CACHE_SETTINGS
+    })
+    errors = []
+    for alias in aliases:
+        backend = settings.CACHES.get(alias, {}).get("BACKEND")
+        if backend in UNSUITABLE_BACKENDS:
+            errors.append(checks.Error(
+                f"The {alias!r} cache {UNSUITABLE_BACKENDS[backend]}, but "
+                "must be shared by every worker process.",
+                hint=(
+                    "Point it at a shared in-memory cache such as "
+                    "PyMemcacheCache."
+                ),
+                id="caches.E001",
+            ))
+    return errors
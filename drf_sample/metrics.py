@@ -0,0 +1,352 @@
+"""
+Request metrics in the Prometheus text format.
+
+`MetricsMiddleware` records, per resolved route (e.g. "api_v1:recipe-list")
+and method, histograms of the request latency, the number of SQL queries
+and the time spent in them, the time serializers spent representing
+objects (see `TimedSerializerMixin`) and the response size, plus a count
+of requests by status. `metrics_view` serves them to the addresses in
+`METRICS_ALLOWED_IPS`, and to requests bearing `METRICS_TOKEN`.
+
+Each process keeps its metrics in memory. With `METRICS_DIR` set, it also
+writes them to a file of its own in that directory at most every
+`METRICS_FLUSH_SECONDS`, and `metrics_view` adds up the files of every
+process, so that any worker can report for all of them. Files are named
+after the pid and the time of the process's first flush, so a process
+reusing the pid of an exited one doesn't overwrite its file. Files of
+exited processes are kept so that counters never go back; empty the
+directory when the server restarts.
+"""
+import hmac
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# name: (help, buckets)
+HISTOGRAMS = {
+    "http_request_duration_seconds": (
+        "Time to produce the response.",
+        LATENCY_BUCKETS,
+    ),
+    "http_request_db_queries": (
+        "SQL queries run per request.",
+        QUERY_BUCKETS,
+    ),
+    "http_request_db_duration_seconds": (
+        "Time spent in SQL queries per request.",
+        LATENCY_BUCKETS,
+    ),
+    "http_request_serializer_duration_seconds": (
+        "Time spent serializing objects per request.",
+        LATENCY_BUCKETS,
+    ),
+    "http_response_size_bytes": (
+        "Size of the response body, except for streamed responses.",
+        SIZE_BUCKETS,
+    ),
+}
+REQUESTS_TOTAL = "http_requests_total"
+UNMATCHED_ROUTE = "unmatched"
+
+_state = Local()
+
+
+def get_metrics_dir():
+    return getattr(settings, "METRICS_DIR", None)
+
+
+class Registry:
+    """The metrics of this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (name, route, method): [count per bucket..., count above, sum]
+        self.histograms = {}
+        # (route, method, status): count
+        self.requests = Counter()
+        self.flushed_at = time.monotonic()
+        self.file_pid = None
+        self.file_name = None
+
+    def observe(self, name, route, method, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, route, method)
+        with self.lock:
+            counts = self.histograms.get(key)
+            if counts is None:
+                counts = self.histograms[key] = [0] * (len(buckets) + 2)
+            index = next(
+                (i for i, bound in enumerate(buckets) if value <= bound),
+                len(buckets),
+            )
+            counts[index] += 1
+            counts[-1] += value
+
+    def count_request(self, route, method, status):
+        with self.lock:
+            self.requests[route, method, str(status)] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "histograms": [
+                    [*key, list(counts)]
+                    for key, counts in self.histograms.items()
+                ],
+                "requests": [
+                    [*key, count] for key, count in self.requests.items()
+                ],
+            }
+
+    def flush(self, directory):
+        """Write the metrics to this process's file in `directory`"""
+        self.flushed_at = time.monotonic()
+        snapshot = self.snapshot()
+        fd, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(snapshot, file)
+        # Readers only ever see whole files
+        os.replace(path, os.path.join(directory, self.get_file_name()))
+
+    def get_file_name(self):
+        pid = os.getpid()
+        if self.file_pid != pid:
+            # First flush of this process, which may have been forked, or
+            # reuse the pid of an exited one
+            self.file_pid = pid
+            self.file_name = f"{pid}-{time.time_ns()}.json"
+        return self.file_name
+
+    def maybe_flush(self):
+        directory = get_metrics_dir()
+        interval = getattr(settings, "METRICS_FLUSH_SECONDS", 5)
+        if directory and time.monotonic() - self.flushed_at >= interval:
+            self.flush(directory)
+
+
+registry = Registry()
+
+
+def collect():
+    """Return the snapshots of every process reporting to METRICS_DIR"""
+    directory = get_metrics_dir()
+    if not directory:
+        return [registry.snapshot()]
+    registry.flush(directory)
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            # Removed, or not one of ours
+            continue
+    return snapshots
+
+
+def merge(snapshots):
+    histograms = {}
+    requests = Counter()
+    for snapshot in snapshots:
+        for name, route, method, counts in snapshot["histograms"]:
+            if name not in HISTOGRAMS:
+                continue
+            total = histograms.setdefault(
+                (name, route, method),
+                [0] * len(counts),
+            )
+            if len(total) != len(counts):
+                # Written with other buckets
+                continue
+            for i, count in enumerate(counts):
+                total[i] += count
+        for route, method, status, count in snapshot["requests"]:
+            requests[route, method, status] += count
+    return histograms, requests
+
+
+def _labels(**labels):
+    def escape(value):
+        return (
+            str(value)
+            .replace("\\", "\\\\")
+            .replace("\n", "\\n")
+            .replace('"', '\\"')
+        )
+
+    return ",".join(
+        f'{name}="{escape(value)}"' for name, value in labels.items()
+    )
+
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+def render(histograms, requests):
+    """Return the metrics in the Prometheus text exposition format"""
+    lines = [
+        f"# HELP {REQUESTS_TOTAL} Requests served.",
+        f"# TYPE {REQUESTS_TOTAL} counter",
+    ]
+    for (route, method, status), count in sorted(requests.items()):
+        labels = _labels(route=route, method=method, status=status)
+        lines.append(f"{REQUESTS_TOTAL}{{{labels}}} {count}")
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, route, method), counts in sorted(histograms.items()):
+            if metric != name:
+                continue
+            labels = _labels(route=route, method=method)
+            cumulative = 0
+            for bound, count in zip(buckets + ("+Inf",), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_bound(bound)
+                lines.append(
+                    f'{name}_bucket{{{labels},le="{le}"}} {cumulative}'
+                )
+            lines.append(f"{name}_sum{{{labels}}} {counts[-1]}")
+            lines.append(f"{name}_count{{{labels}}} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def is_allowed(request):
+    """Whether the request may read the metrics"""
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token:
+        authorization = request.META.get("HTTP_AUTHORIZATION", "")
+        if hmac.compare_digest(authorization, f"Bearer {token}"):
+            return True
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network)
+        for network in getattr(settings, "METRICS_ALLOWED_IPS", [])
+    )
+
+
+def metrics_view(request):
+    if not is_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(*merge(collect())), content_type=CONTENT_TYPE)
+
+
+class QueryTimer:
+    """`execute_wrapper` counting queries and the time they take"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class SerializerTimer:
+    def __init__(self):
+        self.depth = 0
+        self.seconds = 0.0
+
+
+class TimedSerializerMixin:
+    """Add the time spent in `to_representation` to the request metrics"""
+
+    def to_representation(self, instance):
+        timer = getattr(_state, "serializer_timer", None)
+        if timer is None or timer.depth:
+            # Outside a request, or nested in a timed serializer
+            return super().to_representation(instance)
+        timer.depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timer.depth -= 1
+            timer.seconds += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Record the metrics of every request. Goes first in MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryTimer()
+        serializers = _state.serializer_timer = SerializerTimer()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(queries))
+                response = self.get_response(request)
+        finally:
+            _state.serializer_timer = None
+        duration = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        route = match.view_name if match is not None else UNMATCHED_ROUTE
+        method = request.method
+        registry.count_request(route, method, response.status_code)
+        registry.observe(
+            "http_request_duration_seconds",
+            route,
+            method,
+            duration,
+        )
+        registry.observe(
+            "http_request_db_queries",
+            route,
+            method,
+            queries.count,
+        )
+        registry.observe(
+            "http_request_db_duration_seconds",
+            route,
+            method,
+            queries.seconds,
+        )
+        registry.observe(
+            "http_request_serializer_duration_seconds",
+            route,
+            method,
+            serializers.seconds,
+        )
+        if not response.streaming:
+            registry.observe(
+                "http_response_size_bytes",
+                route,
+                method,
+                len(response.content),
+            )
+        registry.maybe_flush()
+        return response
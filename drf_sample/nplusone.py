@@ -0,0 +1,105 @@
+"""
+Detection of N+1 queries.
+
+`NPlusOneMiddleware` fingerprints the SQL run while serving each request:
+the statement with its literals and parameters left out, and `IN` lists
+collapsed. A serializer field running the same fingerprint
+`NPLUSONE_THRESHOLD` times is loading a relation per object rather than
+having it prefetched by the view. That's logged with a stack trace or,
+with `NPLUSONE_RAISE` (on in the test settings), raised as `NPlusOneError`.
+
+Streamed responses are serialized after the middleware returns and so
+aren't checked.
+"""
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from rest_framework.serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_in_list_re = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_whitespace_re = re.compile(r"\s+")
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """Return `sql` with the parts that vary between objects left out"""
+    sql = _literal_re.sub("?", sql)
+    sql = _in_list_re.sub("(...)", sql)
+    return _whitespace_re.sub(" ", sql).strip()
+
+
+def serializer_field(frame):
+    """
+    Return "<serializer>.<field>" for the innermost serializer field being
+    represented in the stack from `frame`, or None.
+    """
+    while frame is not None:
+        # Serializer.to_representation loops over the fields as `field`
+        if frame.f_code.co_name == "to_representation":
+            local = frame.f_locals
+            serializer = local.get("self")
+            field = local.get("field")
+            if isinstance(serializer, Serializer) and field is not None:
+                return f"{type(serializer).__name__}.{field.field_name}"
+        frame = frame.f_back
+    return None
+
+
+class NPlusOneDetector:
+    """`execute_wrapper` reporting repeated queries of a serializer field"""
+
+    def __init__(self, threshold, raise_errors=False):
+        self.threshold = threshold
+        self.raise_errors = raise_errors
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.check(sql)
+        return execute(sql, params, many, context)
+
+    def check(self, sql):
+        # Skip this method and the execute wrapper
+        field = serializer_field(sys._getframe(2))
+        if field is None:
+            return
+        key = (field, fingerprint(sql))
+        self.counts[key] += 1
+        if self.counts[key] != self.threshold:
+            return
+        message = (
+            f"{field} ran {self.threshold} queries like: {key[1]}. Prefetch "
+            "the relation in the view's queryset."
+        )
+        if self.raise_errors:
+            raise NPlusOneError(message)
+        logger.warning("N+1 queries: %s", message, stack_info=True)
+
+
+class NPlusOneMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = getattr(settings, "NPLUSONE_THRESHOLD", 5)
+        if not threshold:
+            return self.get_response(request)
+        detector = NPlusOneDetector(
+            threshold,
+            getattr(settings, "NPLUSONE_RAISE", False),
+        )
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(detector))
+            return self.get_response(request)
@@ -0,0 +1,129 @@
+"""
+Read replica routing.
+
+Views using `ReplicaReadMixin` read from one of the `DATABASE_REPLICAS`
+aliases on safe-method requests. Everything else, including every write,
+goes to "default".
+
+A user who wrote something is pinned to the primary for
+`REPLICA_STICKY_SECONDS`, so they always read their own writes even while
+the replicas lag behind. Pins live in the `REPLICA_PIN_CACHE_ALIAS`
+cache, and only hold across processes if every worker shares it (see
+`drf_sample.caches`). `ReplicaMiddleware` sets the pins and resets the
+routing at the end of every request.
+"""
+import random
+
+from asgiref.local import Local
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from rest_framework.permissions import SAFE_METHODS
+
+_state = Local()
+
+
+def get_replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def get_pin_cache():
+    return caches[getattr(settings, "REPLICA_PIN_CACHE_ALIAS", "default")]
+
+
+def _pin_key(user_id):
+    return f"replica_pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Send the user's reads to the primary for the next few seconds"""
+    get_pin_cache().set(
+        _pin_key(user_id),
+        True,
+        getattr(settings, "REPLICA_STICKY_SECONDS", 5),
+    )
+
+
+def is_pinned(user_id):
+    return bool(get_pin_cache().get(_pin_key(user_id)))
+
+
+def use_replica():
+    """Read from a random replica until `reset()`"""
+    replicas = get_replicas()
+    _state.alias = random.choice(replicas) if replicas else None
+
+
+def reset():
+    _state.alias = None
+
+
+def current_replica():
+    return getattr(_state, "alias", None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = current_replica()
+        if alias is None:
+            return None
+        # Reads inside a transaction on the primary must see its writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Objects read from a replica are written to the primary; those of
+        # other databases stay where they are
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db not in get_replicas():
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema from the primary
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Pin users to the primary after unsafe requests and make sure no request
+    leaks its replica to the next one served by the same thread.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset()
+        try:
+            response = self.get_response(request)
+        finally:
+            reset()
+        if request.method not in SAFE_METHODS:
+            user = getattr(request, "user", None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    Read from a replica on safe-method requests, unless the user recently
+    wrote something. Needs `ReplicaMiddleware`.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and get_replicas():
+            if not is_pinned(request.user.pk):
+                use_replica()
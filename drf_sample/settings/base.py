@@ -48,11 +48,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'drf_sample.metrics.MetricsMiddleware',
+    'drf_sample.nplusone.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'drf_sample.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -120,3 +123,91 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = "accounts.User"
+
+# Cache
+# Each environment configures a shared in-memory cache such as Memcached:
+# the recipe data versions, the token cache and the replica pins are read
+# on nearly every request and only hold across worker processes through it.
+# `drf_sample.caches` rejects per-process and database caches while
+# REQUIRE_SHARED_CACHES is on.
+REQUIRE_SHARED_CACHES = True
+
+# Read replicas
+# Aliases of DATABASES that views using ReplicaReadMixin read from on safe
+# requests. Users stay on the primary for REPLICA_STICKY_SECONDS after a
+# write; the pins are kept in the REPLICA_PIN_CACHE_ALIAS cache, which must be
+# shared by every worker process.
+DATABASE_ROUTERS = [
+    "recipes.sharding.ShardRouter",
+    "drf_sample.replicas.ReplicaRouter",
+]
+DATABASE_REPLICAS = []
+REPLICA_STICKY_SECONDS = 5
+REPLICA_PIN_CACHE_ALIAS = "default"
+
+# Metrics
+# Served in the Prometheus text format at /metrics, only to the addresses or
+# networks in METRICS_ALLOWED_IPS and to requests with an
+# "Authorization: Bearer <METRICS_TOKEN>" header. With METRICS_DIR set to
+# a directory shared by the worker processes of a host, each writes its
+# metrics there every METRICS_FLUSH_SECONDS and /metrics reports them all.
+METRICS_DIR = None
+METRICS_FLUSH_SECONDS = 5
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+METRICS_TOKEN = None
+
+# N+1 query detection
+# A serializer field running the same query NPLUSONE_THRESHOLD times in one
+# request is logged with a stack trace, or raised with NPLUSONE_RAISE. A
+# threshold of 0 turns detection off.
+NPLUSONE_THRESHOLD = 5
+NPLUSONE_RAISE = False
+
+# Recipe shards
+# Aliases of DATABASES that the tags, ingredients and recipes of each user
+# are spread over, by user id; empty keeps them all on "default". Data on a
+# shard is read from the shard itself, not from DATABASE_REPLICAS. Users stay
+# on the shard they were first placed on when shards are added, and are
+# moved between shards with `manage.py move_user_shard`, keeping their ids:
+# while sharded, ids are handed out from "default" in blocks of
+# RECIPE_SHARD_ID_BLOCK_SIZE per process, so they're unique across shards.
+RECIPE_SHARDS = []
+RECIPE_SHARD_ID_BLOCK_SIZE = 100
+
+# Token authentication cache
+# Resolved tokens are kept in the cache below, checked against a per-token
+# generation bumped on every eviction, and for a few seconds in a
+# per-process LRU, which bounds how long other processes keep accepting an
+# evicted token.
+AUTH_TOKEN_CACHE_ALIAS = "default"
+AUTH_TOKEN_CACHE_TIMEOUT = 300
+AUTH_TOKEN_LOCAL_CACHE_SIZE = 1024
+AUTH_TOKEN_LOCAL_CACHE_TIMEOUT = 5
+
+# Recipe list response cache
+# Entries are keyed on a per-user version bumped by recipes.signals.
+RECIPES_CACHE_ALIAS = "default"
+RECIPES_LIST_CACHE_TIMEOUT = 300
+
+# Recipe image variants
+# Generated by a pool of RECIPE_IMAGE_WORKERS threads (0 runs them inline),
+# each fitted within its (width, height) box.
+RECIPE_IMAGE_WORKERS = 2
+RECIPE_IMAGE_FORMAT = "WEBP"
+RECIPE_IMAGE_VARIANTS = {
+    "thumbnail": (200, 200),
+    "medium": (800, 800),
+}
+# Limits enforced while an image upload is streamed in
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+
+# Threads serving the async read endpoints under ASGI (api.asgi)
+ASYNC_READ_WORKERS = 8
+
+# Text search configuration of the recipe title index on PostgreSQL
+RECIPES_SEARCH_CONFIG = "english"
+
+# Per-user tag/ingredient autocomplete indexes kept in each process
+AUTOCOMPLETE_CACHE_SIZE = 1000
+AUTOCOMPLETE_CACHE_TIMEOUT = 600
@@ -12,6 +12,13 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+        "LOCATION": "127.0.0.1:11211",
+    },
+}
+
 INSTALLED_APPS = INSTALLED_APPS + ["django_extensions"]
 
 try:
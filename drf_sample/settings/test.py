@@ -0,0 +1,41 @@
+from drf_sample.settings.base import *
+
+# Local SQLite databases: the primary, a replica of it, and two recipe
+# shards. Under test the replica mirrors the primary's test database.
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+    'shard1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'shard1.sqlite3',
+    },
+    'shard2': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'shard2.sqlite3',
+    },
+}
+
+# Tests run in one process
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+REQUIRE_SHARED_CACHES = False
+
+# Switched on by the tests covering replica routing and sharding, so that
+# the other tests only touch the primary
+DATABASE_REPLICAS = []
+RECIPE_SHARDS = []
+
+# Fail tests on N+1 queries rather than logging them
+NPLUSONE_RAISE = True
@@ -0,0 +1,32 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """TestCase mixin checking that requests don't query more as data grows"""
+
+    dataset_sizes = (1, 10)
+
+    def assertMaxQueries(self, limit, request, grow, sizes=None,
+                         using=DEFAULT_DB_ALIAS):
+        """
+        For each of `sizes`, grow the data to that size with `grow(count)`,
+        which adds `count` objects, and assert that `request()` runs at most
+        `limit` queries. A request whose queries grow with the data fails
+        on the larger sizes.
+        """
+        size = 0
+        for target in sizes or self.dataset_sizes:
+            grow(target - size)
+            size = target
+            with CaptureQueriesContext(connections[using]) as queries:
+                request()
+            self.assertLessEqual(
+                len(queries),
+                limit,
+                "{} queries with {} objects:\n{}".format(
+                    len(queries),
+                    size,
+                    "\n".join(query["sql"] for query in queries),
+                ),
+            )
@@ -3,8 +3,11 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from drf_sample.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
 
     path("api/v1/", include(("api.urls", "api"), namespace="api_v1")),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from django.core import checks
+
+        from drf_sample.caches import check_shared_caches
+        from recipes import signals  # noqa: F401
+
+        checks.register(check_shared_caches, checks.Tags.caches)
@@ -0,0 +1,84 @@
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from drf_sample.lru import LRUCache
+from recipes.cache import get_user_version
+
+
+class PrefixIndex:
+    """Sorted array of names answering case-insensitive prefix queries"""
+
+    def __init__(self, rows):
+        entries = sorted(
+            (name.casefold(), name, pk) for pk, name in rows
+        )
+        self.keys = [key for key, _, _ in entries]
+        self.items = [{"id": pk, "name": name} for _, name, pk in entries]
+
+    def search(self, prefix, limit):
+        prefix = prefix.casefold()
+        start = bisect_left(self.keys, prefix)
+        matches = []
+        for key, item in zip(
+            self.keys[start:start + limit],
+            self.items[start:start + limit],
+        ):
+            if not key.startswith(prefix):
+                break
+            matches.append(item)
+        return matches
+
+
+_indexes = None
+_indexes_lock = threading.Lock()
+
+
+def get_indexes():
+    global _indexes
+    with _indexes_lock:
+        if _indexes is None:
+            _indexes = LRUCache(
+                max_size=getattr(settings, "AUTOCOMPLETE_CACHE_SIZE", 1000),
+                timeout=getattr(settings, "AUTOCOMPLETE_CACHE_TIMEOUT", 600),
+            )
+        return _indexes
+
+
+def complete(model, user_id, prefix, limit):
+    """
+    Return up to `limit` of the user's `model` objects whose name starts
+    with `prefix`, in alphabetical order.
+
+    Each user's names are loaded once into a `PrefixIndex`, which is
+    rebuilt when the user's data version changes (see `recipes.cache`).
+    Checking the version is a single lookup in the shared in-memory cache,
+    so a warm index answers without touching the database.
+    """
+    # Read the version before the rows, so a write racing with the rebuild
+    # leaves a stale version behind rather than stale rows.
+    version = get_user_version(user_id)
+    key = (model._meta.label, user_id)
+    indexes = get_indexes()
+    entry = indexes.get(key)
+    if entry is None or entry[0] != version:
+        rows = model.objects.filter(user_id=user_id).values_list("id", "name")
+        entry = (version, PrefixIndex(rows))
+        indexes.set(key, entry)
+    return entry[1].search(prefix, limit)
+
+
+def clear():
+    """Drop the indexes, which are rebuilt with the current settings"""
+    global _indexes
+    with _indexes_lock:
+        _indexes = None
+
+
+@receiver(setting_changed)
+def clear_on_setting_changed(setting, **kwargs):
+    if setting in ("AUTOCOMPLETE_CACHE_SIZE", "AUTOCOMPLETE_CACHE_TIMEOUT"):
+        clear()
@@ -0,0 +1,53 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+def get_cache():
+    return caches[getattr(settings, "RECIPES_CACHE_ALIAS", "default")]
+
+
+def _version_key(user_id):
+    return f"recipes_version:{user_id}"
+
+
+def get_user_version(user_id):
+    """
+    Return the version of a user's tags, ingredients and recipes.
+
+    The version changes whenever any of them is written, so it can be used
+    to key cached data derived from them.
+    """
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1 so that a lost counter never
+        # comes back with a version that was already handed out.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    cache = get_cache()
+    key = _version_key(user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+        return cache.get(key)
+
+
+def bump_user_version_on_write(user_id, using=DEFAULT_DB_ALIAS):
+    """
+    Bump the version for a write on `using`, now and again once the
+    transaction commits. Until then concurrent reads still see the old
+    rows, and whatever they cache under the first bump is left behind by
+    the second.
+    """
+    bump_user_version(user_id)
+    transaction.on_commit(partial(bump_user_version, user_id), using=using)
@@ -0,0 +1,65 @@
+"""
+Counts over a filtered set of recipes, for the filter UI.
+
+Every facet is one aggregated query that takes the filtered recipes as a
+`pk IN (...)` subquery, so the filters themselves never have to be
+evaluated in Python.
+"""
+from django.db import models
+from django.db.models.functions import Floor
+
+from recipes.models import Recipe
+
+
+def related_counts(recipes, name):
+    """
+    Number of `recipes` linked to each tag or ingredient (`name` is the
+    many-to-many field), most used first.
+    """
+    field = Recipe._meta.get_field(name)
+    source = field.m2m_column_name()
+    target = field.m2m_reverse_name()
+    related = field.m2m_reverse_field_name()
+    rows = field.remote_field.through.objects.filter(
+        **{f"{source}__in": recipes}
+    ).values(target, f"{related}__name").annotate(
+        count=models.Count("pk"),
+    ).order_by("-count", f"{related}__name", target)
+    return [
+        {
+            "id": row[target],
+            "name": row[f"{related}__name"],
+            "count": row["count"],
+        }
+        for row in rows
+    ]
+
+
+def histogram(recipes, name, width):
+    """
+    Number of `recipes` in each `[min, max)` bucket of `width` over the
+    `name` column. Empty buckets are left out.
+    """
+    rows = Recipe.objects.filter(pk__in=recipes).annotate(
+        bucket=Floor(models.F(name) / models.Value(width)),
+    ).values("bucket").annotate(
+        count=models.Count("pk"),
+    ).order_by("bucket")
+    return [
+        {
+            "min": int(row["bucket"]) * width,
+            "max": (int(row["bucket"]) + 1) * width,
+            "count": row["count"],
+        }
+        for row in rows
+    ]
+
+
+def count_facets(queryset, price_width, time_width):
+    recipes = queryset.order_by().values("pk")
+    return {
+        "tags": related_counts(recipes, "tags"),
+        "ingredients": related_counts(recipes, "ingredients"),
+        "price": histogram(recipes, "price", price_width),
+        "time_minutes": histogram(recipes, "time_minutes", time_width),
+    }
@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from PIL import Image, ImageOps, features
+
+from recipes.cache import bump_user_version
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VARIANTS = {
+    "thumbnail": (200, 200),
+    "medium": (800, 800),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_variant_sizes():
+    return getattr(settings, "RECIPE_IMAGE_VARIANTS", DEFAULT_VARIANTS)
+
+
+def get_variant_format():
+    """Return the Pillow format variants are written in"""
+    image_format = getattr(settings, "RECIPE_IMAGE_FORMAT", "WEBP").upper()
+    if image_format == "WEBP" and not features.check("webp"):
+        return "JPEG"
+    return image_format
+
+
+def variant_file_path(source, variant, image_format):
+    root, _ = os.path.splitext(source)
+    extension = "jpg" if image_format == "JPEG" else image_format.lower()
+    return f"{root}_{variant}.{extension}"
+
+
+def render_variant(image, size, image_format):
+    """Return the encoded bytes and dimensions of `image` fitted in `size`"""
+    variant = image.copy()
+    variant.thumbnail(size)
+    if image_format == "JPEG" and variant.mode != "RGB":
+        variant = variant.convert("RGB")
+    elif variant.mode not in ("RGB", "RGBA"):
+        variant = variant.convert("RGBA")
+
+    buffer = BytesIO()
+    variant.save(buffer, format=image_format, quality=85)
+    return buffer.getvalue(), variant.size
+
+
+def delete_files(storage, paths):
+    for path in paths:
+        storage.delete(path)
+
+
+def generate_variants(recipe_id, using=DEFAULT_DB_ALIAS, replaced=()):
+    """
+    Write the resized variants of a recipe's image and record them on the
+    recipe, read from and saved to the `using` database. Nothing is recorded
+    if the image was replaced in the meantime.
+
+    `replaced` are the paths of the variants of the image the upload
+    replaced, deleted once the recipe no longer lists them.
+    """
+    recipes = Recipe.objects.using(using)
+    try:
+        recipe = recipes.only("id", "user", "image").get(pk=recipe_id)
+    except Recipe.DoesNotExist:
+        return
+    storage = recipe.image.storage
+    if not recipe.image:
+        # Nothing to process, but don't leave the recipe pending
+        updated = recipes.filter(
+            Q(image="") | Q(image__isnull=True),
+            pk=recipe_id,
+        ).update(
+            image_status=Recipe.ImageStatus.NONE,
+            image_variants={},
+        )
+        delete_files(storage, replaced)
+        if updated:
+            bump_user_version(recipe.user_id)
+        return
+
+    source = recipe.image.name
+    image_format = get_variant_format()
+    variants = {}
+    status = Recipe.ImageStatus.READY
+    try:
+        with recipe.image.open("rb") as file, Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+            for name, size in get_variant_sizes().items():
+                content, (width, height) = render_variant(
+                    image,
+                    size,
+                    image_format,
+                )
+                path = storage.save(
+                    variant_file_path(source, name, image_format),
+                    ContentFile(content),
+                )
+                variants[name] = {
+                    "path": path,
+                    "width": width,
+                    "height": height,
+                }
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Uploads were checked to be images, so this isn't the client's doing
+        logger.exception("Can't generate variants of %s", source)
+        status = Recipe.ImageStatus.FAILED
+
+    updated = recipes.filter(pk=recipe_id, image=source).update(
+        image_status=status,
+        image_variants=variants,
+    )
+    # The upload already dropped the replaced variants from the recipe
+    delete_files(storage, replaced)
+    if not updated:
+        delete_files(storage, [
+            variant["path"] for variant in variants.values()
+        ])
+        return
+    # update() sends no signals, so refresh cached lists by hand
+    bump_user_version(recipe.user_id)
+
+
+def _run(recipe_id, using, replaced):
+    try:
+        generate_variants(recipe_id, using, replaced)
+    except Exception:
+        logger.exception("Processing image of recipe %s failed", recipe_id)
+    finally:
+        # Worker threads own their connection; don't leave it open
+        connections[using].close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "RECIPE_IMAGE_WORKERS", 2),
+                thread_name_prefix="recipe-images",
+            )
+        return _executor
+
+
+def schedule_variants(recipe_id, using=DEFAULT_DB_ALIAS, replaced=()):
+    """
+    Generate the variants of a recipe's image on the worker pool, or inline
+    when `RECIPE_IMAGE_WORKERS` is 0.
+    """
+    if getattr(settings, "RECIPE_IMAGE_WORKERS", 2) <= 0:
+        generate_variants(recipe_id, using, replaced)
+        return None
+    return get_executor().submit(_run, recipe_id, using, replaced)
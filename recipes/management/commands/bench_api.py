@@ -0,0 +1,445 @@
+import json
+import math
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from io import BytesIO
+from itertools import count
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    teardown_databases,
+)
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from drf_sample.metrics import QueryTimer
+from recipes import seeding
+from recipes.models import Tag, Ingredient, Recipe
+
+PASSWORD = "bench-password"
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted `values`"""
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def png_upload():
+    buffer = BytesIO()
+    Image.new("RGB", (64, 64), "orange").save(buffer, format="PNG")
+    return SimpleUploadedFile("bench.png", buffer.getvalue(), "image/png")
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed users, tags, ingredients and recipes, then request every "
+        "route of api/urls.py in-process and print the latency percentiles, "
+        "throughput, query counts and peak memory of each as JSON. Runs in "
+        "a throwaway test database unless --in-place is given. Memory is "
+        "traced with tracemalloc in a second pass over each endpoint, so "
+        "that tracing doesn't slow the timed one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5)
+        parser.add_argument("--tags", type=int, default=50, help="Per user.")
+        parser.add_argument(
+            "--ingredients",
+            type=int,
+            default=100,
+            help="Per user.",
+        )
+        parser.add_argument(
+            "--recipes",
+            type=int,
+            default=500,
+            help="Per user.",
+        )
+        parser.add_argument(
+            "--tags-per-recipe",
+            type=int,
+            default=4,
+            help="Mean number of tags of a recipe.",
+        )
+        parser.add_argument(
+            "--ingredients-per-recipe",
+            type=int,
+            default=8,
+            help="Mean number of ingredients of a recipe.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests per endpoint.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Requests in flight at once.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Don't serve lists from the response cache.",
+        )
+        parser.add_argument(
+            "--in-place",
+            action="store_true",
+            help=(
+                "Seed and request the configured database itself rather "
+                "than a throwaway test database."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        for name in ("requests", "concurrency"):
+            if options[name] < 1:
+                raise CommandError(f"--{name} must be at least 1.")
+        media_root = tempfile.mkdtemp()
+        with ExitStack() as stack:
+            stack.callback(shutil.rmtree, media_root, ignore_errors=True)
+            overrides = {
+                "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"],
+                # Like production, and without logging every query
+                "DEBUG": False,
+                "MEDIA_ROOT": media_root,
+            }
+            if options["no_cache"]:
+                overrides["RECIPES_LIST_CACHE_TIMEOUT"] = 0
+            stack.enter_context(override_settings(**overrides))
+            if not options["in_place"]:
+                old_config = setup_databases(
+                    verbosity=0,
+                    interactive=False,
+                    aliases={DEFAULT_DB_ALIAS},
+                )
+                stack.callback(teardown_databases, old_config, verbosity=0)
+
+            users = self.seed(options)
+            results = {
+                f"{method.upper()} {name}": self.run_endpoint(
+                    method,
+                    build,
+                    options["requests"],
+                    options["concurrency"],
+                    options["seed"],
+                )
+                for name, method, build in self.endpoints(users)
+            }
+
+        config = {
+            key: options[key] for key in (
+                "users",
+                "tags",
+                "ingredients",
+                "recipes",
+                "tags_per_recipe",
+                "ingredients_per_recipe",
+                "requests",
+                "concurrency",
+                "seed",
+                "no_cache",
+            )
+        }
+        self.stdout.write(json.dumps(
+            {"config": config, "endpoints": results},
+            indent=2,
+        ))
+
+    def seed(self, options):
+        """
+        Create the users with their data and return, per user, the user,
+        its token and the ids of its tags, ingredients and recipes.
+        """
+        User = get_user_model()
+        first_ids = seeding.next_ids((User, Tag, Ingredient, Recipe))
+        seeding.insert(seeding.generate(
+            options["users"],
+            options["tags"],
+            options["ingredients"],
+            options["recipes"],
+            password_hash=make_password(PASSWORD),
+            first_ids=first_ids,
+            tags_per_recipe=options["tags_per_recipe"],
+            ingredients_per_recipe=options["ingredients_per_recipe"],
+            seed=options["seed"],
+        ))
+        users = []
+        for user in User.objects.filter(
+            pk__gte=first_ids[User],
+        ).order_by("pk"):
+            users.append({
+                "user": user,
+                "token": Token(user=user, key=Token.generate_key()),
+                "tags": list(user.tag_set.order_by("pk").values_list(
+                    "pk",
+                    flat=True,
+                )),
+                "ingredients": list(user.ingredient_set.order_by(
+                    "pk",
+                ).values_list("pk", flat=True)),
+                "recipes": list(user.recipe_set.order_by("pk").values_list(
+                    "pk",
+                    flat=True,
+                )),
+            })
+        Token.objects.bulk_create(user["token"] for user in users)
+        for user in users:
+            user["token"] = user["token"].key
+        return users
+
+    def endpoints(self, users):
+        """
+        Return (url name, method, build) for every route of api/urls.py,
+        where `build(rng)` returns the user and keyword arguments of one
+        request. Builds don't overlap, and anything they do besides is left
+        out of the timings.
+        """
+        new_users = count()
+
+        def url(name, *args):
+            return reverse(f"api_v1:{name}", args=args)
+
+        def get(name, params=None):
+            return lambda rng: (rng.choice(users), {
+                "path": url(name),
+                "data": params,
+            })
+
+        def detail(rng, **kwargs):
+            user = rng.choice(users)
+            recipe_id = rng.choice(user["recipes"])
+            return user, {"path": url("recipe-detail", recipe_id), **kwargs}
+
+        def create_account(rng):
+            return None, {
+                "path": url("accounts_create"),
+                "data": {
+                    "email": f"new{next(new_users)}@example.com",
+                    "password": PASSWORD,
+                    "name": "New",
+                },
+            }
+
+        def obtain_token(rng):
+            return None, {
+                "path": url("accounts_token"),
+                "data": {
+                    "email": rng.choice(users)["user"].email,
+                    "password": PASSWORD,
+                },
+            }
+
+        def update_me(rng):
+            return rng.choice(users), {
+                "path": url("accounts_me"),
+                "data": {"name": "Renamed", "password": PASSWORD},
+            }
+
+        def create_attribute(name):
+            return lambda rng: (rng.choice(users), {
+                "path": url(f"{name}-list"),
+                "data": {"name": f"new {name}"},
+            })
+
+        def autocomplete(name):
+            return lambda rng: (rng.choice(users), {
+                "path": url(f"{name}-autocomplete"),
+                "data": {"q": name[:rng.randint(1, len(name))]},
+            })
+
+        def recipe_data(rng, user):
+            return {
+                "title": "new recipe",
+                "time_minutes": rng.randint(5, 240),
+                "price": "12.50",
+                "tags": seeding.popular_sample(rng, user["tags"], 4),
+                "ingredients": seeding.popular_sample(
+                    rng,
+                    user["ingredients"],
+                    8,
+                ),
+            }
+
+        def create_recipe(rng):
+            user = rng.choice(users)
+            return user, {
+                "path": url("recipe-list"),
+                "data": recipe_data(rng, user),
+                "format": "json",
+            }
+
+        def update_recipe(rng):
+            user, kwargs = detail(rng)
+            return user, {
+                **kwargs,
+                "data": {"title": "renamed recipe"},
+                "format": "json",
+            }
+
+        def delete_recipe(rng):
+            user = rng.choice(users)
+            recipe = Recipe.objects.create(
+                user=user["user"],
+                title="doomed recipe",
+                time_minutes=10,
+                price=5,
+            )
+            recipe.tags.set(seeding.popular_sample(rng, user["tags"], 4))
+            return user, {"path": url("recipe-detail", recipe.pk)}
+
+        def upload_image(rng):
+            user = rng.choice(users)
+            return user, {
+                "path": url(
+                    "recipe-upload-image",
+                    rng.choice(user["recipes"]),
+                ),
+                "data": {"image": png_upload()},
+                "format": "multipart",
+            }
+
+        return [
+            ("api-root", "get", get("api-root")),
+            ("accounts_create", "post", create_account),
+            ("accounts_token", "post", obtain_token),
+            ("accounts_me", "get", get("accounts_me")),
+            ("accounts_me", "patch", update_me),
+            ("tag-list", "get", get("tag-list")),
+            ("tag-list", "post", create_attribute("tag")),
+            ("tag-autocomplete", "get", autocomplete("tag")),
+            ("ingredient-list", "get", get("ingredient-list")),
+            ("ingredient-list", "post", create_attribute("ingredient")),
+            ("ingredient-autocomplete", "get", autocomplete("ingredient")),
+            ("recipe-list", "get", get("recipe-list")),
+            ("recipe-list", "post", create_recipe),
+            ("recipe-detail", "get", detail),
+            ("recipe-detail", "patch", update_recipe),
+            ("recipe-detail", "delete", delete_recipe),
+            ("recipe-export", "get", get("recipe-export")),
+            ("recipe-facets", "get", get("recipe-facets")),
+            ("recipe-upload-image", "post", upload_image),
+        ]
+
+    def run_endpoint(self, method, build, requests, concurrency, seed):
+        if method != "get" and connections[DEFAULT_DB_ALIAS].vendor == "sqlite":
+            # SQLite locks the whole table for a write
+            concurrency = 1
+        # Both passes start from an empty cache
+        caches["default"].clear()
+        samples, elapsed = self.send(
+            method,
+            build,
+            requests,
+            concurrency,
+            seed,
+        )
+
+        # Python memory allocated at the endpoint's peak, over what was
+        # already held before it, measured in a pass of its own
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            caches["default"].clear()
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            self.send(method, build, requests, concurrency, seed)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            if started:
+                tracemalloc.stop()
+        peak_memory = max(peak - baseline, 0)
+
+        latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+        queries = [count for _, count, _ in samples]
+        return {
+            "requests": len(samples),
+            "concurrency": concurrency,
+            "errors": sum(error for _, _, error in samples),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "latency_ms": {
+                name: round(percentile(latencies, fraction), 3)
+                for name, fraction in (
+                    ("p50", 0.50),
+                    ("p95", 0.95),
+                    ("p99", 0.99),
+                    ("max", 1.0),
+                )
+            },
+            "queries": {
+                "mean": round(sum(queries) / len(queries), 2),
+                "max": max(queries),
+            },
+            "peak_memory_kb": peak_memory // 1024,
+        }
+
+    def send(self, method, build, requests, concurrency, seed):
+        """
+        Send `requests` requests from `concurrency` threads and return the
+        (seconds, queries, error) of each and the seconds they all took.
+        """
+        build_lock = threading.Lock()
+
+        def worker(index, count):
+            rng = random.Random(f"{seed}:{index}")
+            client = APIClient(raise_request_exception=False)
+            samples = []
+            for _ in range(count):
+                with build_lock:
+                    user, kwargs = build(rng)
+                if user is not None:
+                    kwargs["HTTP_AUTHORIZATION"] = f"Token {user['token']}"
+                path = kwargs.pop("path")
+                queries = QueryTimer()
+                start = time.perf_counter()
+                with ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(
+                            connection.execute_wrapper(queries)
+                        )
+                    response = getattr(client, method)(path, **kwargs)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                samples.append((
+                    time.perf_counter() - start,
+                    queries.count,
+                    response.status_code >= 400,
+                ))
+            return samples
+
+        shares = [
+            requests // concurrency + (index < requests % concurrency)
+            for index in range(concurrency)
+        ]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = [
+                sample
+                for future in [
+                    pool.submit(worker, index, count)
+                    for index, count in enumerate(shares)
+                ]
+                for sample in future.result()
+            ]
+        return samples, time.perf_counter() - start
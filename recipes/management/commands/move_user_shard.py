@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from recipes import search, sharding
+from recipes.cache import bump_user_version
+from recipes.models import Tag, Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the tags, ingredients and recipes of a user to another shard "
+        "of RECIPE_SHARDS, keeping their ids. Run it while the user is "
+        "inactive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("user_id", type=int)
+        parser.add_argument("shard", help="Alias of the destination shard.")
+
+    def handle(self, *args, user_id, shard, **options):
+        shards = sharding.get_shards()
+        if shard not in shards:
+            raise CommandError(
+                f"{shard!r} isn't one of RECIPE_SHARDS: {shards}"
+            )
+        if not get_user_model().objects.using(DEFAULT_DB_ALIAS).filter(
+            pk=user_id,
+        ).exists():
+            raise CommandError(f"User {user_id} doesn't exist")
+
+        source = sharding.shard_for_user(user_id)
+        if source == shard:
+            self.stdout.write(f"User {user_id} is already on {shard}")
+            return
+
+        with transaction.atomic(using=shard):
+            # Left over by an interrupted move; the user isn't routed here
+            for model in (Recipe, Tag, Ingredient):
+                model.objects.using(shard).filter(user_id=user_id).delete()
+            counts, renumbered = self.copy(user_id, source, shard)
+
+        sharding.assign_shard(user_id, shard)
+        for model in (Recipe, Tag, Ingredient):
+            model.objects.using(source).filter(user_id=user_id).delete()
+        bump_user_version(user_id)
+
+        self.stdout.write(
+            f"Moved {counts[Recipe]} recipes, {counts[Tag]} tags and "
+            f"{counts[Ingredient]} ingredients of user {user_id} "
+            f"from {source} to {shard}"
+        )
+        if renumbered:
+            self.stdout.write(
+                f"{renumbered} of them had ids taken on {shard}, from "
+                "before ids were allocated across shards, and got new ones"
+            )
+
+    def copy(self, user_id, source, target):
+        """
+        Copy the user's rows from `source` to `target` and return how many
+        there were and how many got new ids.
+
+        Ids are allocated across shards (see `recipes.sharding`), so rows
+        keep theirs, unless the id was already taken on `target` by a row
+        inserted before that.
+        """
+        new_ids = {}
+        renumbered = 0
+        for model in (Tag, Ingredient, Recipe):
+            objects = list(
+                model.objects.using(source).filter(user_id=user_id)
+            )
+            old_ids = [obj.pk for obj in objects]
+            taken_ids = set(model.objects.using(target).filter(
+                pk__in=old_ids,
+            ).values_list("pk", flat=True))
+            taken = [obj for obj in objects if obj.pk in taken_ids]
+            for obj, pk in zip(
+                taken,
+                sharding.allocate_ids(model, len(taken)),
+            ):
+                obj.pk = pk
+            for obj in objects:
+                obj._state.adding = True
+            model.objects.using(target).bulk_create(objects)
+            new_ids[model] = {
+                old_id: obj.pk for old_id, obj in zip(old_ids, objects)
+            }
+            renumbered += len(taken)
+            if model is Recipe:
+                for recipe in objects:
+                    search.index_recipe(recipe, target)
+
+        recipe_ids = new_ids[Recipe]
+        for name, model in (("tags", Tag), ("ingredients", Ingredient)):
+            field = Recipe._meta.get_field(name)
+            through = field.remote_field.through
+            source_column = field.m2m_column_name()
+            target_column = field.m2m_reverse_name()
+            links = through.objects.using(source).filter(**{
+                f"{source_column}__in": list(recipe_ids),
+            }).values_list(source_column, target_column)
+            through.objects.using(target).bulk_create([
+                through(**{
+                    source_column: recipe_ids[recipe_id],
+                    target_column: new_ids[model][related_id],
+                })
+                for recipe_id, related_id in links
+            ])
+
+        counts = {model: len(ids) for model, ids in new_ids.items()}
+        return counts, renumbered
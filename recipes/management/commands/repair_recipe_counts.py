@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Tag, Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the recipe_count of tags and ingredients from the "
+        "recipe links, fixing any that have drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database to repair. Defaults to the \"default\" database.",
+        )
+
+    def handle(self, *args, database, **options):
+        for model in (Tag, Ingredient):
+            repaired = model.objects.using(database).repair_recipe_counts()
+            self.stdout.write(
+                f"Repaired {repaired} {model._meta.verbose_name_plural}"
+            )
@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import seeding, sharding
+from recipes.models import Tag, Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users with their tags, ingredients and recipes, "
+        "inserted in batches. The same options and --seed give the same "
+        "data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument(
+            "--tags",
+            type=int,
+            default=20,
+            help="Tags per user.",
+        )
+        parser.add_argument(
+            "--ingredients",
+            type=int,
+            default=50,
+            help="Ingredients per user.",
+        )
+        parser.add_argument(
+            "--recipes",
+            type=int,
+            default=100,
+            help="Recipes per user.",
+        )
+        parser.add_argument(
+            "--tags-per-recipe",
+            type=int,
+            default=4,
+            help="Mean number of tags of a recipe.",
+        )
+        parser.add_argument(
+            "--ingredients-per-recipe",
+            type=int,
+            default=8,
+            help="Mean number of ingredients of a recipe.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows inserted per transaction.",
+        )
+        parser.add_argument(
+            "--password",
+            default="password",
+            help="Password of every generated user.",
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database to seed. Defaults to the \"default\" database.",
+        )
+
+    def handle(self, *args, database, **options):
+        if sharding.get_shards():
+            # Rows are all inserted in one database, not each user's shard
+            raise CommandError("Seeding isn't supported with RECIPE_SHARDS.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        User = get_user_model()
+        inserted = seeding.insert(
+            seeding.generate(
+                options["users"],
+                options["tags"],
+                options["ingredients"],
+                options["recipes"],
+                # Hashed once: the hasher is slow on purpose
+                password_hash=make_password(options["password"]),
+                first_ids=seeding.next_ids(
+                    (User, Tag, Ingredient, Recipe),
+                    using=database,
+                ),
+                tags_per_recipe=options["tags_per_recipe"],
+                ingredients_per_recipe=options["ingredients_per_recipe"],
+                seed=options["seed"],
+            ),
+            batch_size=options["batch_size"],
+            using=database,
+        )
+        for model in (
+            User,
+            Tag,
+            Ingredient,
+            Recipe,
+            Recipe.tags.through,
+            Recipe.ingredients.through,
+        ):
+            self.stdout.write(
+                f"Created {inserted[model]} {model._meta.verbose_name_plural}"
+            )
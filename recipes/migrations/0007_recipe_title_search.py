@@ -0,0 +1,40 @@
+from django.db import migrations
+
+from recipes.search import FTS_TABLE, search_config
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title) "
+            "SELECT id, title FROM recipes_recipe"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX recipe_title_search_idx ON recipes_recipe "
+            "USING GIN (to_tsvector(%s::regconfig, title))",
+            (search_config(),),
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE {FTS_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX recipe_title_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.6 on 2026-10-16 23:58
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_recipes(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    db = schema_editor.connection.alias
+    for name in ("tags", "ingredients"):
+        field = Recipe._meta.get_field(name)
+        target = field.m2m_reverse_name()
+        counts = field.remote_field.through.objects.filter(
+            **{target: models.OuterRef("pk")}
+        ).order_by().values(target).annotate(
+            count=models.Count("pk"),
+        ).values("count")
+        field.related_model.objects.using(db).update(recipe_count=Coalesce(
+            models.Subquery(counts, output_field=models.IntegerField()),
+            0,
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_title_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+    ]
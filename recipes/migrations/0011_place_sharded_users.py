@@ -0,0 +1,44 @@
+import zlib
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, migrations
+
+
+def place_users(apps, schema_editor):
+    """
+    Record the shard of users placed by hashing alone, before placements
+    were recorded, so that adding shards doesn't move them.
+    """
+    shards = list(getattr(settings, "RECIPE_SHARDS", []))
+    if not shards or schema_editor.connection.alias != DEFAULT_DB_ALIAS:
+        return
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserShard = apps.get_model("recipes", "UserShard")
+    user_ids = User.objects.filter(usershard__isnull=True).values_list(
+        "pk",
+        flat=True,
+    )
+    UserShard.objects.bulk_create(
+        (
+            UserShard(
+                user_id=user_id,
+                alias=shards[
+                    zlib.crc32(str(user_id).encode("ascii")) % len(shards)
+                ],
+            )
+            for user_id in user_ids.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0010_user_shards'),
+    ]
+
+    operations = [
+        migrations.RunPython(place_users, migrations.RunPython.noop),
+    ]
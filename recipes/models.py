@@ -1,26 +1,147 @@
 import uuid
 import os
+from collections import defaultdict
 
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.db.models.functions import Coalesce
 
+from recipes import sharding
 
-class Tag(models.Model):
-    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, null=False)
+
+class ShardedQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # Ids unique across shards, see `recipes.sharding`
+        objs = list(objs)
+        if sharding.get_shards():
+            new = [obj for obj in objs if obj.pk is None]
+            ids = sharding.allocate_ids(self.model, len(new))
+            for obj, pk in zip(new, ids):
+                obj.pk = pk
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class ShardedModel(models.Model):
+    """Model whose rows get ids unique across shards when sharded"""
+
+    class Meta:
+        abstract = True
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if self.pk is None and sharding.get_shards():
+            [self.pk] = sharding.allocate_ids(type(self), 1)
+            force_insert = True
+        super().save(
+            force_insert=force_insert,
+            force_update=force_update,
+            using=using,
+            update_fields=update_fields,
+        )
+
+
+class RecipeAttributeQuerySet(ShardedQuerySet):
+    """Queries shared by tags and ingredients"""
+
+    def _links(self):
+        """Return the through table rows pointing at each row of `self`"""
+        field = self.model._meta.get_field("recipe").field
+        target = field.m2m_reverse_name()
+        return field.remote_field.through.objects.filter(
+            **{target: models.OuterRef("pk")}
+        ), target
+
+    def assigned(self):
+        """
+        Keep the objects used by at least one recipe, as an EXISTS semijoin
+        on the through table rather than a DISTINCT over a join.
+        """
+        links, _ = self._links()
+        return self.filter(models.Exists(links))
+
+    def actual_recipe_count(self):
+        """Expression counting the links of each row, for `recipe_count`"""
+        links, target = self._links()
+        counts = links.order_by().values(target).annotate(
+            count=models.Count("pk"),
+        ).values("count")
+        return Coalesce(
+            models.Subquery(counts, output_field=models.IntegerField()),
+            0,
+        )
+
+    def add_recipe_counts(self, deltas):
+        """
+        Add `deltas` ({pk: change}) to `recipe_count` in place, with one
+        UPDATE per distinct change.
+        """
+        pks_by_delta = defaultdict(list)
+        for pk, delta in deltas.items():
+            if delta:
+                pks_by_delta[delta].append(pk)
+        for delta, pks in pks_by_delta.items():
+            self.filter(pk__in=pks).update(
+                recipe_count=models.F("recipe_count") + delta,
+            )
+
+    def repair_recipe_counts(self):
+        """
+        Recompute `recipe_count` where it has drifted from the through table
+        and return the number of rows fixed.
+        """
+        actual = self.actual_recipe_count()
+        return self.exclude(recipe_count=actual).update(recipe_count=actual)
+
+
+class Tag(ShardedModel):
+    # Users live on "default" while their tags may be on another shard (see
+    # `recipes.sharding`), so none of the user keys can be enforced by the
+    # database
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        null=False,
+        db_constraint=False,
+    )
     name = models.CharField(max_length=255, null=False, blank=False)
+    # Number of recipes using the tag, kept up to date by `recipes.signals`
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeAttributeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Lists are filtered by user and paginated on (name, id)
+            models.Index(
+                fields=["user", "name", "id"],
+                name="tag_user_name_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(ShardedModel):
     name = models.CharField(max_length=255, null=False, blank=False)
     user = models.ForeignKey(
         get_user_model(),
         on_delete=models.CASCADE,
         null=False,
-        blank=False
+        blank=False,
+        db_constraint=False,
     )
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeAttributeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "name", "id"],
+                name="ingredient_user_name_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -33,13 +154,90 @@ def recipe_image_file_path(instance, filename):
     return os.path.join("uploads/recipe/", filename)
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(ShardedQuerySet):
+    """Query plans matching what each recipe serializer actually reads"""
+
+    SUMMARY_FIELDS = (
+        "id",
+        "title",
+        "time_minutes",
+        "price",
+        "link",
+        "image_status",
+        "image_variants",
+    )
+    RELATED_FIELDS = {
+        "tags": Tag,
+        "ingredients": Ingredient,
+    }
+
+    def with_related(self, name, ids, match_all=False):
+        """
+        Keep the recipes linked to any, or with `match_all` every one, of
+        the `name` objects with the given ids.
+
+        Both modes only look at the through table: "any" is an EXISTS
+        semijoin, so recipes matching several ids aren't duplicated, and
+        "all" is a single GROUP BY/HAVING over the matching links.
+        """
+        field = self.model._meta.get_field(name)
+        source = field.m2m_column_name()
+        target = field.m2m_reverse_name()
+        ids = set(ids)
+        links = field.remote_field.through.objects.filter(
+            **{f"{target}__in": ids}
+        )
+        if match_all:
+            return self.filter(pk__in=links.values(source).annotate(
+                matched=models.Count("pk"),
+            ).filter(matched=len(ids)).values(source))
+        return self.filter(models.Exists(
+            links.filter(**{source: models.OuterRef("pk")})
+        ))
+
+    def _plan(self, fields, related_columns):
+        if fields is None:
+            fields = self.SUMMARY_FIELDS + tuple(self.RELATED_FIELDS)
+        # Recipes are always ordered by title, so it's always loaded
+        columns = ["id", "title"] + [
+            name for name in fields if name in self.SUMMARY_FIELDS
+        ]
+        queryset = self.only(*columns)
+        for name, model in self.RELATED_FIELDS.items():
+            if name in fields:
+                queryset = queryset.prefetch_related(models.Prefetch(
+                    name,
+                    queryset=model.objects.only(*related_columns),
+                ))
+        return queryset
+
+    def for_list(self, fields=None):
+        """
+        Load only the columns of the given serializer `fields` and prefetch
+        the related ids, so that listing recipes costs the same number of
+        queries however many recipes there are.
+        """
+        return self._plan(fields, ("id",))
+
+    def for_detail(self, fields=None):
+        """Like `for_list`, but prefetch the nested tags and ingredients"""
+        return self._plan(fields, ("id", "name", "recipe_count"))
+
+
+class Recipe(ShardedModel):
+    class ImageStatus(models.TextChoices):
+        NONE = "none"
+        PENDING = "pending"
+        READY = "ready"
+        FAILED = "failed"
+
     title = models.CharField(max_length=255, null=False, blank=False)
     user = models.ForeignKey(
         get_user_model(),
         null=False,
         blank=False,
         on_delete=models.CASCADE,
+        db_constraint=False,
     )
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -51,6 +249,62 @@ class Recipe(models.Model):
         "Tag"
     )
     image = models.ImageField(upload_to=recipe_image_file_path, null=True)
+    # Resized copies of `image`, generated in the background by
+    # `recipes.images`: {"<variant>": {"path", "width", "height"}}
+    image_status = models.CharField(
+        max_length=16,
+        choices=ImageStatus.choices,
+        default=ImageStatus.NONE,
+    )
+    image_variants = models.JSONField(default=dict, blank=True)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Lists are filtered by user and paginated on (title, id)
+            models.Index(
+                fields=["user", "title", "id"],
+                name="recipe_user_title_idx",
+            ),
+            # Range filters on price and time
+            models.Index(
+                fields=["user", "price"],
+                name="recipe_user_price_idx",
+            ),
+            models.Index(
+                fields=["user", "time_minutes"],
+                name="recipe_user_time_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class UserShard(models.Model):
+    """
+    The shard holding a user's recipe data, recorded when the user is first
+    placed so that adding shards doesn't move them. Only kept on "default".
+    """
+    user = models.OneToOneField(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    alias = models.CharField(max_length=64)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.alias}"
+
+
+class ShardSequence(models.Model):
+    """
+    The next id to hand out for new rows of a sharded model, so that ids are
+    unique across shards. Only kept on "default".
+    """
+    model = models.CharField(max_length=100, primary_key=True)
+    next_id = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.model}: {self.next_id}"
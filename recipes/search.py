@@ -0,0 +1,118 @@
+"""
+Full-text search over recipe titles.
+
+On SQLite titles are mirrored into the FTS5 table `recipes_recipe_fts`,
+kept in sync by `recipes.signals`. On PostgreSQL the GIN index on
+`to_tsvector(<config>, title)` created by the migration is used directly,
+and results are ranked with `ts_rank`, which only looks at the title.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "recipes_recipe_fts"
+
+_word_re = re.compile(r"\w+")
+
+
+def search_config():
+    """Text search configuration used on PostgreSQL"""
+    return getattr(settings, "RECIPES_SEARCH_CONFIG", "english")
+
+
+def fts5_query(text):
+    """
+    Turn free text into an FTS5 query matching every word as a prefix,
+    without letting FTS5 operators through.
+    """
+    return " ".join(f'"{word}"*' for word in _word_re.findall(text))
+
+
+def search(queryset, text):
+    """
+    Filter `queryset` to recipes whose title matches `text`, annotated with
+    a `search_rank` (higher is better).
+
+    The rank of a recipe only depends on its own title, never on the other
+    rows of the index, which hold every user's recipes: search results are
+    paginated by rank, and a rank moved by someone else's write would make
+    the next page skip or repeat results.
+    """
+    vendor = connections[queryset.db].vendor
+    table = queryset.model._meta.db_table
+    if vendor == "postgresql":
+        vector = f'to_tsvector(%s::regconfig, "{table}"."title")'
+        query = "plainto_tsquery(%s::regconfig, %s)"
+        params = (search_config(), search_config(), text)
+        return queryset.filter(
+            RawSQL(f"{vector} @@ {query}", params, BooleanField())
+        ).annotate(search_rank=RawSQL(
+            f"ts_rank({vector}, {query})",
+            params,
+            FloatField(),
+        ))
+
+    if vendor != "sqlite":
+        # No index to search with; fall back to a plain substring match
+        return queryset.filter(title__icontains=text).annotate(
+            search_rank=RawSQL("0", (), FloatField())
+        )
+
+    match = fts5_query(text)
+    if not match:
+        return queryset.none().annotate(
+            search_rank=RawSQL("0", (), FloatField())
+        )
+    # Every word matches, so rank by the share of the title they make up.
+    # bm25() would weigh them by statistics of the whole table.
+    title = f'trim("{table}"."title")'
+    words = f"length({title}) - length(replace({title}, ' ', '')) + 1"
+    return queryset.filter(id__in=RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+        (match,),
+    )).annotate(search_rank=RawSQL(f"1.0 / ({words})", (), FloatField()))
+
+
+def index_recipe(recipe, using):
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+            (recipe.pk,),
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title) VALUES (%s, %s)",
+            (recipe.pk, recipe.title),
+        )
+
+
+def unindex_recipe(recipe, using):
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+            (recipe.pk,),
+        )
+
+
+def index_recipes(recipes, using):
+    """Index new recipes inserted in bulk, which sends no signals"""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+            [(recipe.pk,) for recipe in recipes],
+        )
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title) VALUES (%s, %s)",
+            [(recipe.pk, recipe.title) for recipe in recipes],
+        )
@@ -0,0 +1,208 @@
+"""
+Deterministic synthetic data, inserted in bulk.
+
+`generate()` streams users with their tags, ingredients, recipes and recipe
+links, one user at a time; the same arguments always give the same data.
+`insert()` writes such a stream with `bulk_create` in batches, so memory
+stays bounded however many rows are generated.
+
+Primary keys are handed out up front, following the largest in the
+database, so links can point at rows that aren't inserted yet and no ids
+have to be read back. Every user gets the same precomputed password hash
+instead of paying for a key derivation each.
+"""
+import random
+from collections import Counter
+from decimal import Decimal
+from functools import lru_cache
+from itertools import accumulate, chain
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+
+from recipes import search
+from recipes.models import Tag, Ingredient, Recipe
+
+TAG_NAMES = (
+    "Vegan", "Vegetarian", "Quick", "Dessert", "Breakfast", "Dinner",
+    "Lunch", "Spicy", "Gluten free", "Comfort food", "Healthy", "Party",
+    "Summer", "Winter", "Kids", "Baking", "Grill", "One pot",
+)
+INGREDIENT_NAMES = (
+    "Salt", "Pepper", "Olive oil", "Butter", "Garlic", "Onion", "Flour",
+    "Sugar", "Egg", "Milk", "Tomato", "Lemon", "Rice", "Chicken", "Basil",
+    "Potato", "Carrot", "Cheese", "Honey", "Ginger", "Beans", "Mushroom",
+)
+DISHES = (
+    "soup", "stew", "curry", "salad", "pie", "risotto", "pasta", "tart",
+    "casserole", "stir fry", "bowl", "cake", "pancakes", "roast",
+)
+STYLES = (
+    "Classic", "Rustic", "Spicy", "Creamy", "Smoky", "Zesty", "Easy",
+    "Grandma's", "Weeknight", "Crispy", "Slow cooked", "Herby",
+)
+
+
+@lru_cache(maxsize=None)
+def popularity(size):
+    """Cumulative weights making item n about 1/n as likely as the first"""
+    return tuple(accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+def popular_sample(rng, population, mean):
+    """
+    Pick around `mean` distinct items, favouring the start of `population`
+    the way a few tags end up on most recipes.
+    """
+    if not population:
+        return []
+    picked = rng.choices(
+        population,
+        cum_weights=popularity(len(population)),
+        k=rng.randint(0, 2 * mean),
+    )
+    return list(dict.fromkeys(picked))
+
+
+def numbered(names, n):
+    """The nth name, numbered once `names` run out"""
+    name = names[n % len(names)]
+    return name if n < len(names) else f"{name} {n // len(names) + 1}"
+
+
+def next_ids(models, using=DEFAULT_DB_ALIAS):
+    """Return the first free primary key of each of `models`"""
+    return {
+        model: (
+            model._default_manager.using(using).aggregate(
+                largest=Max("pk"),
+            )["largest"] or 0
+        ) + 1
+        for model in models
+    }
+
+
+def generate(users, tags, ingredients, recipes, password_hash, first_ids,
+             tags_per_recipe=4, ingredients_per_recipe=8, seed=0):
+    """
+    Yield `users` unsaved users, each followed by its `tags`, `ingredients`
+    and `recipes` and the links between them, numbered from `first_ids`
+    ({model: first primary key}, see `next_ids()`).
+    """
+    User = get_user_model()
+    RecipeTag = Recipe.tags.through
+    RecipeIngredient = Recipe.ingredients.through
+    ids = dict(first_ids)
+
+    def take(model, count):
+        start = ids[model]
+        ids[model] += count
+        return range(start, start + count)
+
+    for n in range(users):
+        # Seeded per user, so that each user's data doesn't depend on how
+        # much the earlier ones got
+        rng = random.Random(f"{seed}:{n}")
+        [user_id] = take(User, 1)
+        tag_ids = take(Tag, tags)
+        ingredient_ids = take(Ingredient, ingredients)
+        recipe_ids = take(Recipe, recipes)
+        links = [
+            (
+                popular_sample(rng, tag_ids, tags_per_recipe),
+                popular_sample(rng, ingredient_ids, ingredients_per_recipe),
+            )
+            for _ in recipe_ids
+        ]
+        tag_counts = Counter(chain.from_iterable(
+            recipe_tags for recipe_tags, _ in links
+        ))
+        ingredient_counts = Counter(chain.from_iterable(
+            recipe_ingredients for _, recipe_ingredients in links
+        ))
+
+        yield User(
+            pk=user_id,
+            email=f"user{user_id}@example.com",
+            name=f"User {user_id}",
+            password=password_hash,
+        )
+        for i, pk in enumerate(tag_ids):
+            yield Tag(
+                pk=pk,
+                user_id=user_id,
+                name=numbered(TAG_NAMES, i),
+                recipe_count=tag_counts[pk],
+            )
+        for i, pk in enumerate(ingredient_ids):
+            yield Ingredient(
+                pk=pk,
+                user_id=user_id,
+                name=numbered(INGREDIENT_NAMES, i),
+                recipe_count=ingredient_counts[pk],
+            )
+        for pk, (recipe_tags, recipe_ingredients) in zip(recipe_ids, links):
+            yield Recipe(
+                pk=pk,
+                user_id=user_id,
+                title=f"{rng.choice(STYLES)} {rng.choice(DISHES)}",
+                time_minutes=rng.randint(5, 240),
+                price=Decimal(rng.randint(100, 5000)) / 100,
+            )
+            for tag_id in recipe_tags:
+                yield RecipeTag(recipe_id=pk, tag_id=tag_id)
+            for ingredient_id in recipe_ingredients:
+                yield RecipeIngredient(
+                    recipe_id=pk,
+                    ingredient_id=ingredient_id,
+                )
+
+
+def insert(rows, batch_size=5000, using=DEFAULT_DB_ALIAS):
+    """
+    Insert the unsaved instances of `rows`, `batch_size` at a time, and
+    return how many of each model were inserted.
+
+    Each batch is inserted in one transaction, in foreign key order, and
+    recipe titles are indexed for search. Signals aren't sent.
+    """
+    User = get_user_model()
+    order = (
+        User,
+        Tag,
+        Ingredient,
+        Recipe,
+        Recipe.tags.through,
+        Recipe.ingredients.through,
+    )
+    pending = {model: [] for model in order}
+    inserted = Counter()
+
+    def flush():
+        with transaction.atomic(using=using):
+            for model, objects in pending.items():
+                if not objects:
+                    continue
+                model._default_manager.using(using).bulk_create(objects)
+                if model is Recipe:
+                    search.index_recipes(objects, using)
+                inserted[model] += len(objects)
+                objects.clear()
+
+    size = 0
+    for row in rows:
+        pending[type(row)].append(row)
+        size += 1
+        if size >= batch_size:
+            flush()
+            size = 0
+    flush()
+
+    # Rows were inserted with explicit keys, which sequences don't follow
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), order[:4]):
+            cursor.execute(sql)
+    return inserted
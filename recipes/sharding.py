@@ -0,0 +1,241 @@
+"""
+Per-user sharding of recipe data.
+
+With `RECIPE_SHARDS` set, the tags, ingredients and recipes of a user, and
+the links between them, live on one of those database aliases: the one
+the user's `UserShard` row assigns them to. A user is placed on the shard
+their id hashes to the first time their data is routed, and the row
+keeps them there when shards are added later, or until the
+`move_user_shard` command moves them. Users and everything else stay on
+"default", which may be one of the shards too.
+
+The directory is read from "default" rather than cached, so that every
+process sees a move as soon as it's committed; within a request the
+lookup is only made once.
+
+While sharded, new rows get their ids from `allocate_ids()` rather than
+from the shard they're inserted into, so that ids are unique across every
+shard and a user keeps them when moved. Each process reserves them in
+blocks of `RECIPE_SHARD_ID_BLOCK_SIZE` from the `ShardSequence` rows on
+"default".
+
+`ShardRouter` places queries using the user of the instance they are
+about when Django passes one, and otherwise the user set for the current
+thread by `ShardRoutingMixin` or `for_user()`.
+"""
+import threading
+import zlib
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max
+from django.dispatch import receiver
+
+_state = Local()
+
+# Models of the shard directory, which only live on "default"
+DIRECTORY_MODELS = ("usershard", "shardsequence")
+
+# Model label: (next id, end of the reserved block)
+_id_blocks = {}
+_id_blocks_lock = threading.Lock()
+
+
+def get_shards():
+    return list(getattr(settings, "RECIPE_SHARDS", []))
+
+
+def is_sharded(model):
+    return (
+        model._meta.app_label == "recipes"
+        and model._meta.model_name not in DIRECTORY_MODELS
+    )
+
+
+def hashed_shard(user_id, shards):
+    return shards[zlib.crc32(str(user_id).encode("ascii")) % len(shards)]
+
+
+def placed_shard(user_id):
+    """Return the alias the user was placed on, or None if they weren't"""
+    from recipes.models import UserShard
+
+    # Never from a replica, which could still have the user elsewhere
+    return UserShard.objects.using(DEFAULT_DB_ALIAS).filter(
+        user_id=user_id,
+    ).values_list("alias", flat=True).first()
+
+
+def shard_for_user(user_id):
+    """
+    Return the alias holding the recipe data of the user, placing the user
+    if they weren't yet.
+    """
+    shards = get_shards()
+    if not shards:
+        return DEFAULT_DB_ALIAS
+    current = user_id == current_user_id()
+    if current and getattr(_state, "alias", None):
+        return _state.alias
+    alias = placed_shard(user_id)
+    if alias is None:
+        from recipes.models import UserShard
+
+        alias = UserShard.objects.using(DEFAULT_DB_ALIAS).get_or_create(
+            user_id=user_id,
+            defaults={"alias": hashed_shard(user_id, shards)},
+        )[0].alias
+    if current:
+        _state.alias = alias
+    return alias
+
+
+def assign_shard(user_id, alias):
+    """Record that the user's recipe data now lives on `alias`"""
+    from recipes.models import UserShard
+
+    UserShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        user_id=user_id,
+        defaults={"alias": alias},
+    )
+
+
+def first_free_id(model):
+    """Return the id above those of `model` on "default" and every shard"""
+    return max(
+        model._default_manager.using(alias).aggregate(
+            largest=Max("pk"),
+        )["largest"] or 0
+        for alias in {DEFAULT_DB_ALIAS, *get_shards()}
+    ) + 1
+
+
+def reserve_ids(model, count):
+    """Reserve `count` ids of `model` and return the first and the end"""
+    from recipes.models import ShardSequence
+
+    sequences = ShardSequence.objects.using(DEFAULT_DB_ALIAS)
+    label = model._meta.label
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        if not sequences.filter(model=label).exists():
+            sequences.get_or_create(
+                model=label,
+                defaults={"next_id": first_free_id(model)},
+            )
+        sequence = sequences.select_for_update().get(model=label)
+        start = sequence.next_id
+        sequence.next_id += count
+        sequence.save(update_fields=["next_id"])
+    return start, start + count
+
+
+def allocate_ids(model, count):
+    """Return `count` ids for new rows of `model`, unique across shards"""
+    label = model._meta.label
+    with _id_blocks_lock:
+        next_id, end = _id_blocks.get(label, (0, 0))
+        if end - next_id < count:
+            next_id, end = reserve_ids(model, max(
+                count,
+                getattr(settings, "RECIPE_SHARD_ID_BLOCK_SIZE", 100),
+            ))
+        _id_blocks[label] = (next_id + count, end)
+    return range(next_id, next_id + count)
+
+
+@receiver(setting_changed)
+def clear_id_blocks(setting, **kwargs):
+    if setting in ("RECIPE_SHARDS", "RECIPE_SHARD_ID_BLOCK_SIZE"):
+        with _id_blocks_lock:
+            _id_blocks.clear()
+
+
+def current_user_id():
+    return getattr(_state, "user_id", None)
+
+
+def use_user(user_id):
+    """Route recipe data queries without an instance to the user's shard"""
+    _state.user_id = user_id
+    _state.alias = None
+
+
+def reset():
+    use_user(None)
+
+
+@contextmanager
+def for_user(user_id):
+    """Route recipe data to the user's shard within the block"""
+    previous = current_user_id()
+    use_user(user_id)
+    try:
+        yield shard_for_user(user_id)
+    finally:
+        use_user(previous)
+
+
+def _instance_user_id(instance):
+    if isinstance(instance, get_user_model()):
+        return instance.pk
+    # Reading a deferred user_id would query, and so route, again
+    return vars(instance).get("user_id")
+
+
+class ShardRouter:
+    def _db_for_model(self, model, **hints):
+        if not is_sharded(model) or not get_shards():
+            return None
+        instance = hints.get("instance")
+        user_id = None
+        if instance is not None:
+            if is_sharded(type(instance)) and instance._state.db:
+                return instance._state.db
+            user_id = _instance_user_id(instance)
+        if user_id is None:
+            user_id = current_user_id()
+        if user_id is None:
+            return None
+        return shard_for_user(user_id)
+
+    db_for_read = _db_for_model
+    db_for_write = _db_for_model
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not get_shards():
+            return None
+        sharded = is_sharded(type(obj1)), is_sharded(type(obj2))
+        if all(sharded):
+            return obj1._state.db == obj2._state.db
+        # Users are on "default" and own data on every shard
+        user_model = get_user_model()
+        if any(sharded) and (
+            isinstance(obj1, user_model) or isinstance(obj2, user_model)
+        ):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Every shard gets the full schema, but the shard directory only
+        # lives on the primary
+        if app_label == "recipes" and model_name in DIRECTORY_MODELS:
+            return db == DEFAULT_DB_ALIAS
+        return None
+
+
+class ShardRoutingMixin:
+    """Route the recipe data of the authenticated user to their shard"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        use_user(request.user.pk)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            reset()
@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from recipes import search, sharding
+from recipes.cache import bump_user_version_on_write
+from recipes.models import Tag, Ingredient, Recipe
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def bump_version_on_write(sender, instance, using, **kwargs):
+    bump_user_version_on_write(instance.user_id, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_version_on_m2m_change(sender, instance, action, using, **kwargs):
+    if action.startswith("post_"):
+        bump_user_version_on_write(instance.user_id, using)
+
+
+RECIPE_ATTRIBUTES = {
+    Recipe.tags.through: Recipe._meta.get_field("tags"),
+    Recipe.ingredients.through: Recipe._meta.get_field("ingredients"),
+}
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_recipe_counts(sender, instance, action, reverse, pk_set, using,
+                         **kwargs):
+    """
+    Keep `recipe_count` of tags and ingredients in step with the links.
+
+    Removals are counted before the rows go, inside the same transaction,
+    since `pk_set` may name objects that weren't linked.
+    """
+    field = RECIPE_ATTRIBUTES[sender]
+    source = field.m2m_column_name()
+    target = field.m2m_reverse_name()
+    if action == "post_add":
+        if reverse:
+            deltas = {instance.pk: len(pk_set)}
+        else:
+            deltas = dict.fromkeys(pk_set, 1)
+    elif action in ("pre_remove", "pre_clear"):
+        links = sender.objects.using(using)
+        if reverse:
+            links = links.filter(**{target: instance.pk})
+            if pk_set is not None:
+                links = links.filter(**{f"{source}__in": pk_set})
+            deltas = {instance.pk: -links.count()}
+        else:
+            links = links.filter(**{source: instance.pk})
+            if pk_set is not None:
+                links = links.filter(**{f"{target}__in": pk_set})
+            deltas = dict.fromkeys(links.values_list(target, flat=True), -1)
+    else:
+        return
+    field.related_model.objects.using(using).add_recipe_counts(deltas)
+
+
+@receiver(pre_delete, sender=Recipe)
+def release_recipe_counts(sender, instance, using, **kwargs):
+    """Deleting a recipe drops its links without sending `m2m_changed`"""
+    for field in RECIPE_ATTRIBUTES.values():
+        ids = field.remote_field.through.objects.using(using).filter(
+            **{field.m2m_column_name(): instance.pk}
+        ).values_list(field.m2m_reverse_name(), flat=True)
+        field.related_model.objects.using(using).add_recipe_counts(
+            dict.fromkeys(ids, -1)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe_title(sender, instance, using, update_fields, **kwargs):
+    if update_fields is not None and "title" not in update_fields:
+        return
+    if "title" in instance.get_deferred_fields():
+        return
+    search.index_recipe(instance, using)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe_title(sender, instance, using, **kwargs):
+    search.unindex_recipe(instance, using)
+
+
+@receiver(post_save, sender=get_user_model())
+def bump_version_on_user_created(sender, instance, created, using,
+                                 **kwargs):
+    """Don't let a reused user id pick up data cached for a deleted user"""
+    if created:
+        bump_user_version_on_write(instance.pk, using)
+
+
+@receiver(pre_delete, sender=get_user_model())
+def delete_sharded_recipe_data(sender, instance, using, **kwargs):
+    """The cascade from a user only reaches its own database"""
+    if not sharding.get_shards():
+        return
+    # Not placing the user now: the row wouldn't be part of the cascade
+    alias = sharding.placed_shard(instance.pk)
+    if alias is not None and alias != using:
+        for model in (Recipe, Tag, Ingredient):
+            model.objects.using(alias).filter(user_id=instance.pk).delete()
@@ -0,0 +1,124 @@
+"""
+Sustained throughput of the recipe list with CONCURRENCY requests in
+flight, served by:
+
+- the WSGI app, from a pool of threads like a threaded WSGI server,
+- Django's stock ASGI handler, where sync views share one thread,
+- the ASGI app of `drf_sample.asgi`, with the async read path.
+
+With the in-memory SQLite test database every request is CPU bound, so
+this mostly shows the cost of funnelling requests through one thread; the
+read pool pays off further when database round trips dominate.
+
+Skipped unless RUN_BENCHMARKS is set, e.g.
+
+    RUN_BENCHMARKS=1 python manage.py test recipes.tests.test_async_benchmark
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+from wsgiref.util import setup_testing_defaults
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.wsgi import get_wsgi_application
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from drf_sample.asgi import application
+from recipes.models import Recipe
+from recipes.tests.test_async_views import asgi_request
+
+RECIPES_URL = reverse("api_v1:recipe-list")
+RECIPES = 200
+CONCURRENCY = 32
+DURATION = 3
+
+
+@skipUnless(os.environ.get("RUN_BENCHMARKS"), "Set RUN_BENCHMARKS to run")
+# Measure the views, not the response cache
+@override_settings(RECIPES_LIST_CACHE_TIMEOUT=0)
+class AsyncThroughputBenchmark(TransactionTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        user = get_user_model().objects.create_user(
+            "bench@test.com",
+            "simple",
+        )
+        self.token = Token.objects.create(user=user).key
+        Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                title=f"recipe {i}",
+                time_minutes=5,
+                price=5.00,
+            )
+            for i in range(RECIPES)
+        ])
+
+    def report(self, name, completed):
+        print(f"\n{name:<28} {completed / DURATION:8.1f} req/s")
+
+    def run_wsgi(self):
+        app = get_wsgi_application()
+        deadline = time.monotonic() + DURATION
+
+        def client():
+            completed = 0
+            while time.monotonic() < deadline:
+                environ = {
+                    "PATH_INFO": RECIPES_URL,
+                    "HTTP_HOST": "testserver",
+                    "HTTP_AUTHORIZATION": f"Token {self.token}",
+                }
+                setup_testing_defaults(environ)
+                statuses = []
+
+                def start_response(status, headers):
+                    statuses.append(status)
+
+                body = app(environ, start_response)
+                b"".join(body)
+                body.close()
+                assert statuses == ["200 OK"], statuses
+                completed += 1
+            return completed
+
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            futures = [pool.submit(client) for _ in range(CONCURRENCY)]
+            return sum(future.result() for future in futures)
+
+    def run_asgi(self, app):
+        async def client(deadline):
+            completed = 0
+            while time.monotonic() < deadline:
+                status, _ = await asgi_request(
+                    app,
+                    "GET",
+                    RECIPES_URL,
+                    self.token,
+                )
+                assert status == 200, status
+                completed += 1
+            return completed
+
+        async def run():
+            deadline = time.monotonic() + DURATION
+            counts = await asyncio.gather(*[
+                client(deadline) for _ in range(CONCURRENCY)
+            ])
+            return sum(counts)
+
+        return async_to_sync(run)()
+
+    def test_throughput(self):
+        self.report("WSGI, threaded", self.run_wsgi())
+        self.report("ASGI, sync views", self.run_asgi(ASGIHandler()))
+        self.report("ASGI, async reads", self.run_asgi(application))
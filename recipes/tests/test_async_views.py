@@ -0,0 +1,204 @@
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from drf_sample.asgi import application
+from api.asgi import is_async_read
+from recipes.models import Recipe, Tag
+from api.recipes.views import RecipeViewSet
+
+RECIPES_URL = reverse("api_v1:recipe-list")
+TAGS_URL = reverse("api_v1:tag-list")
+ME_URL = reverse("api_v1:accounts_me")
+
+
+async def asgi_request(app, method, path, token=None, body=b"",
+                       query_string=""):
+    """Send one HTTP request to the ASGI `app`; return (status, body)"""
+    headers = [(b"host", b"testserver")]
+    if token is not None:
+        headers.append((b"authorization", f"Token {token}".encode()))
+    if body:
+        headers.append((b"content-type", b"application/json"))
+        headers.append((b"content-length", str(len(body)).encode()))
+    communicator = ApplicationCommunicator(app, {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    })
+    await communicator.send_input({"type": "http.request", "body": body})
+    start = await communicator.receive_output(10)
+    content = b""
+    while True:
+        message = await communicator.receive_output(10)
+        content += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    await communicator.wait()
+    return start["status"], content
+
+
+class AsyncReadRoutesTests(TransactionTestCase):
+    """The pool threads need committed rows, hence TransactionTestCase"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "async@test.com",
+            "simple",
+        )
+        self.token = Token.objects.create(user=self.user).key
+
+    def get(self, path, token=None, **kwargs):
+        return async_to_sync(asgi_request)(
+            application,
+            "GET",
+            path,
+            token or self.token,
+            **kwargs,
+        )
+
+    def test_hot_routes_use_read_path(self):
+        factory = RequestFactory()
+        for path in (RECIPES_URL, TAGS_URL, ME_URL, f"{RECIPES_URL}1/"):
+            self.assertTrue(is_async_read(factory.get(path)), path)
+        self.assertFalse(is_async_read(factory.post(RECIPES_URL)))
+        self.assertFalse(
+            is_async_read(factory.get(reverse("api_v1:recipe-export")))
+        )
+        self.assertFalse(is_async_read(factory.get("/missing/")))
+
+    def test_recipe_list_and_detail(self):
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title="Soup",
+            time_minutes=5,
+            price=5.00,
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Vegan"))
+
+        code, content = self.get(RECIPES_URL)
+        self.assertEqual(code, status.HTTP_200_OK)
+        results = json.loads(content)["results"]
+        self.assertEqual([item["title"] for item in results], ["Soup"])
+
+        code, content = self.get(f"{RECIPES_URL}{recipe.id}/")
+        self.assertEqual(code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(content)["tags"][0]["name"], "Vegan")
+
+    def test_filters_apply(self):
+        Recipe.objects.create(
+            user=self.user,
+            title="Soup",
+            time_minutes=5,
+            price=5.00,
+        )
+
+        code, content = self.get(RECIPES_URL, query_string="max_price=1")
+
+        self.assertEqual(json.loads(content)["results"], [])
+
+    def test_tags_and_me(self):
+        Tag.objects.create(user=self.user, name="Vegan")
+
+        code, content = self.get(TAGS_URL)
+        self.assertEqual(code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(content)["results"][0]["name"], "Vegan")
+
+        code, content = self.get(ME_URL)
+        self.assertEqual(code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(content)["email"], "async@test.com")
+
+    def test_authentication_required(self):
+        code, _ = self.get(RECIPES_URL, token="invalid")
+
+        self.assertEqual(code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reads_run_on_read_pool(self):
+        threads = []
+        get_queryset = RecipeViewSet.get_queryset
+
+        def spy(view):
+            threads.append(threading.current_thread().name)
+            return get_queryset(view)
+
+        with patch.object(RecipeViewSet, "get_queryset", spy):
+            self.get(RECIPES_URL)
+
+        self.assertTrue(threads)
+        self.assertTrue(threads[0].startswith("async-read"), threads)
+
+    def test_concurrent_reads(self):
+        async def burst():
+            return await asyncio.gather(*[
+                asgi_request(application, "GET", RECIPES_URL, self.token)
+                for _ in range(10)
+            ])
+
+        responses = async_to_sync(burst)()
+
+        self.assertEqual(
+            [code for code, _ in responses],
+            [status.HTTP_200_OK] * 10,
+        )
+
+    def test_export_streams(self):
+        """Test the export's rows are queried off the event loop"""
+        for title in ("Soup", "Stew"):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=title,
+                time_minutes=5,
+                price=5.00,
+            )
+            recipe.tags.add(Tag.objects.create(user=self.user, name="Vegan"))
+
+        code, content = self.get(reverse("api_v1:recipe-export"))
+
+        self.assertEqual(code, status.HTTP_200_OK)
+        exported = json.loads(content)
+        self.assertEqual(
+            sorted(item["title"] for item in exported),
+            ["Soup", "Stew"],
+        )
+        self.assertEqual(len(exported[0]["tags"]), 1)
+
+    def test_writes_use_sync_path(self):
+        body = json.dumps({
+            "title": "Stew",
+            "time_minutes": 60,
+            "price": "9.00",
+            "tags": [],
+            "ingredients": [],
+        }).encode()
+
+        code, content = async_to_sync(asgi_request)(
+            application,
+            "POST",
+            RECIPES_URL,
+            self.token,
+            body=body,
+        )
+
+        self.assertEqual(code, status.HTTP_201_CREATED, content)
+        self.assertTrue(Recipe.objects.filter(title="Stew").exists())
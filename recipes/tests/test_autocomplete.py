@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes import autocomplete
+from recipes.autocomplete import PrefixIndex
+from recipes.models import Tag, Ingredient
+
+TAGS_AUTOCOMPLETE_URL = reverse("api_v1:tag-autocomplete")
+INGREDIENTS_AUTOCOMPLETE_URL = reverse("api_v1:ingredient-autocomplete")
+
+
+class PrefixIndexTests(TestCase):
+    def test_prefix_search(self):
+        index = PrefixIndex([
+            (1, "Salt"),
+            (2, "sugar"),
+            (3, "Salmon"),
+            (4, "Pepper"),
+        ])
+
+        self.assertEqual(
+            index.search("SA", 10),
+            [{"id": 3, "name": "Salmon"}, {"id": 1, "name": "Salt"}],
+        )
+        self.assertEqual(index.search("s", 2), [
+            {"id": 3, "name": "Salmon"},
+            {"id": 1, "name": "Salt"},
+        ])
+        self.assertEqual(index.search("x", 10), [])
+        self.assertEqual(len(index.search("", 10)), 4)
+
+
+class AutocompleteAPITests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        autocomplete.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "complete@test.com",
+            "simple",
+        )
+        self.client.force_authenticate(self.user)
+        for name in ("Vegan", "Vegetarian", "Dessert"):
+            Tag.objects.create(user=self.user, name=name)
+
+    def names(self, res):
+        return [item["name"] for item in res.data]
+
+    def test_tag_autocomplete(self):
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "veg"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(res), ["Vegan", "Vegetarian"])
+
+    def test_ingredient_autocomplete(self):
+        Ingredient.objects.create(user=self.user, name="Salt")
+        Ingredient.objects.create(user=self.user, name="Pepper")
+
+        res = self.client.get(INGREDIENTS_AUTOCOMPLETE_URL, {"q": "s"})
+
+        self.assertEqual(self.names(res), ["Salt"])
+
+    def test_limit(self):
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "v", "limit": 1})
+
+        self.assertEqual(self.names(res), ["Vegan"])
+
+    def test_served_from_memory(self):
+        self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "v"})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "d"})
+
+        self.assertEqual(self.names(res), ["Dessert"])
+
+    def test_warm_index_runs_no_queries(self):
+        """Test a token-authenticated keystroke on a warm index"""
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        client.get(TAGS_AUTOCOMPLETE_URL, {"q": "v"})
+
+        with self.assertNumQueries(0):
+            res = client.get(TAGS_AUTOCOMPLETE_URL, {"q": "ve"})
+        with self.assertNumQueries(0):
+            matches = autocomplete.complete(Tag, self.user.pk, "d", 10)
+
+        self.assertEqual(self.names(res), ["Vegan", "Vegetarian"])
+        dessert = Tag.objects.get(name="Dessert")
+        self.assertEqual(matches, [{"id": dessert.pk, "name": "Dessert"}])
+
+    def test_invalidated_on_write(self):
+        self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "v"})
+        Tag.objects.create(user=self.user, name="Vegetables")
+        Tag.objects.get(name="Vegan").delete()
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "v"})
+
+        self.assertEqual(self.names(res), ["Vegetables", "Vegetarian"])
+
+    def test_cache_size_setting_applies(self):
+        with override_settings(AUTOCOMPLETE_CACHE_SIZE=1):
+            self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "v"})
+            self.client.get(INGREDIENTS_AUTOCOMPLETE_URL, {"q": "s"})
+
+            self.assertEqual(len(autocomplete.get_indexes()), 1)
+
+        self.assertEqual(autocomplete.get_indexes().max_size, 1000)
+
+    def test_limited_to_user(self):
+        other = get_user_model().objects.create_user(
+            "other@test.com",
+            "simple",
+        )
+        Tag.objects.create(user=other, name="Vermouth")
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "ver"})
+
+        self.assertEqual(res.data, [])
@@ -0,0 +1,64 @@
+import json
+import tracemalloc
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from recipes.management.commands.bench_api import Command
+
+
+class BenchAPICommandTests(TransactionTestCase):
+    """Requests are sent from worker threads, which need committed rows"""
+
+    def test_reports_every_endpoint(self):
+        out = StringIO()
+
+        call_command(
+            "bench_api",
+            "--in-place",
+            "--users=2",
+            "--tags=3",
+            "--ingredients=3",
+            "--recipes=5",
+            "--requests=3",
+            stdout=out,
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["config"]["requests"], 3)
+        self.assertIn("GET recipe-list", report["endpoints"])
+        self.assertIn("DELETE recipe-detail", report["endpoints"])
+        for name, result in report["endpoints"].items():
+            self.assertEqual(result["requests"], 3, name)
+            self.assertEqual(result["errors"], 0, name)
+            self.assertLessEqual(
+                result["latency_ms"]["p50"],
+                result["latency_ms"]["p99"],
+                name,
+            )
+            self.assertGreaterEqual(result["peak_memory_kb"], 0, name)
+        # The export holds whole batches of recipes in memory
+        self.assertGreater(
+            report["endpoints"]["GET recipe-export"]["peak_memory_kb"],
+            0,
+        )
+
+    def test_latency_measured_without_tracing(self):
+        traced = []
+
+        def build(rng):
+            traced.append(tracemalloc.is_tracing())
+            return None, {"path": reverse("api_v1:api-root")}
+
+        result = Command().run_endpoint("get", build, 2, 1, 0)
+
+        # The timed pass, then the memory pass
+        self.assertEqual(traced, [False, False, True, True])
+        self.assertEqual(result["requests"], 2)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_requests_validated(self):
+        with self.assertRaises(CommandError):
+            call_command("bench_api", "--in-place", "--requests=0")
@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase, override_settings
+
+from drf_sample.caches import check_shared_caches
+
+MEMCACHED = {
+    "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+    "LOCATION": "127.0.0.1:11211",
+}
+
+
+@override_settings(REQUIRE_SHARED_CACHES=True)
+class SharedCacheCheckTests(SimpleTestCase):
+    def test_shared_cache_accepted(self):
+        with override_settings(CACHES={"default": MEMCACHED}):
+            self.assertEqual(check_shared_caches(None), [])
+
+    def test_unshared_caches_rejected(self):
+        for backend in (
+            "django.core.cache.backends.locmem.LocMemCache",
+            "django.core.cache.backends.db.DatabaseCache",
+        ):
+            with override_settings(CACHES={"default": {
+                "BACKEND": backend,
+                "LOCATION": "django_cache",
+            }}):
+                self.assertEqual(
+                    [error.id for error in check_shared_caches(None)],
+                    ["caches.E001"],
+                    backend,
+                )
+
+    def test_every_shared_alias_checked(self):
+        with override_settings(
+            CACHES={
+                "default": MEMCACHED,
+                "pins": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                },
+            },
+            REPLICA_PIN_CACHE_ALIAS="pins",
+        ):
+            errors = check_shared_caches(None)
+
+        self.assertEqual(len(errors), 1)
+        self.assertIn("'pins'", errors[0].msg)
+
+    @override_settings(REQUIRE_SHARED_CACHES=False)
+    def test_not_required(self):
+        self.assertEqual(check_shared_caches(None), [])
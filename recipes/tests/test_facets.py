@@ -0,0 +1,133 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag, Ingredient
+
+FACETS_URL = reverse("api_v1:recipe-facets")
+
+
+def sample_recipe(user, title, price, time_minutes):
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=time_minutes,
+        price=price,
+    )
+
+
+class RecipeFacetsAPITests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "facets@test.com",
+            "simple",
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.quick = Tag.objects.create(user=self.user, name="Quick")
+        self.salt = Ingredient.objects.create(user=self.user, name="Salt")
+
+        salad = sample_recipe(self.user, "Salad", Decimal("4.50"), 10)
+        salad.tags.add(self.vegan, self.quick)
+        salad.ingredients.add(self.salt)
+        soup = sample_recipe(self.user, "Soup", Decimal("6.00"), 40)
+        soup.tags.add(self.vegan)
+        sample_recipe(self.user, "Stew", Decimal("12.00"), 95)
+
+    def test_facets(self):
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["tags"], [
+            {"id": self.vegan.id, "name": "Vegan", "count": 2},
+            {"id": self.quick.id, "name": "Quick", "count": 1},
+        ])
+        self.assertEqual(res.data["ingredients"], [
+            {"id": self.salt.id, "name": "Salt", "count": 1},
+        ])
+        self.assertEqual(res.data["price"], [
+            {"min": Decimal("0.00"), "max": Decimal("5.00"), "count": 1},
+            {"min": Decimal("5.00"), "max": Decimal("10.00"), "count": 1},
+            {"min": Decimal("10.00"), "max": Decimal("15.00"), "count": 1},
+        ])
+        self.assertEqual(res.data["time_minutes"], [
+            {"min": 0, "max": 15, "count": 1},
+            {"min": 30, "max": 45, "count": 1},
+            {"min": 90, "max": 105, "count": 1},
+        ])
+
+    def test_facets_filtered(self):
+        res = self.client.get(FACETS_URL, {"tags": self.vegan.id})
+
+        self.assertEqual(res.data["tags"], [
+            {"id": self.vegan.id, "name": "Vegan", "count": 2},
+            {"id": self.quick.id, "name": "Quick", "count": 1},
+        ])
+        self.assertEqual(
+            [bucket["count"] for bucket in res.data["price"]],
+            [1, 1],
+        )
+
+        res = self.client.get(FACETS_URL, {
+            "tags": f"{self.vegan.id},{self.quick.id}",
+            "match": "all",
+        })
+
+        self.assertEqual([tag["count"] for tag in res.data["tags"]], [1, 1])
+        self.assertEqual(len(res.data["time_minutes"]), 1)
+
+    def test_facets_limited_to_user(self):
+        other = get_user_model().objects.create_user(
+            "other@test.com",
+            "simple",
+        )
+        recipe = sample_recipe(other, "Other", Decimal("1.00"), 1)
+        recipe.tags.add(Tag.objects.create(user=other, name="Other"))
+
+        res = self.client.get(FACETS_URL)
+
+        self.assertNotIn(
+            "Other",
+            [tag["name"] for tag in res.data["tags"]],
+        )
+        self.assertEqual(
+            sum(bucket["count"] for bucket in res.data["price"]),
+            3,
+        )
+
+    def test_one_query_per_facet(self):
+        with self.assertNumQueries(4):
+            self.client.get(FACETS_URL, {"tags": self.vegan.id})
+
+    def test_cached_until_recipes_change(self):
+        params = {"tags": self.vegan.id}
+        first = self.client.get(FACETS_URL, params)
+
+        with self.assertNumQueries(0):
+            again = self.client.get(FACETS_URL, params)
+        self.assertEqual(again.data, first.data)
+
+        res = self.client.get(
+            FACETS_URL,
+            params,
+            HTTP_IF_NONE_MATCH=first["ETag"],
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Recipe.objects.get(title="Soup").tags.add(self.quick)
+
+        res = self.client.get(FACETS_URL, params)
+        self.assertEqual([tag["count"] for tag in res.data["tags"]], [2, 2])
+
+    def test_invalid_match(self):
+        res = self.client.get(FACETS_URL, {"match": "some"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,94 @@
+"""
+Timings for the tag filters on a dataset with many tags per recipe.
+
+Skipped unless RUN_BENCHMARKS is set, e.g.
+
+    RUN_BENCHMARKS=1 python manage.py test recipes.tests.test_filter_benchmark
+"""
+import os
+import random
+import time
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from recipes.models import Recipe, Tag
+
+RECIPES = 5000
+TAGS = 200
+TAGS_PER_RECIPE = 20
+ROUNDS = 5
+
+
+def best_of(rounds, func):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@skipUnless(os.environ.get("RUN_BENCHMARKS"), "Set RUN_BENCHMARKS to run")
+class TagFilterBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(14)
+        cls.user = get_user_model().objects.create_user(
+            "bench@test.com",
+            "simple",
+        )
+        Tag.objects.bulk_create([
+            Tag(user=cls.user, name=f"tag {i}") for i in range(TAGS)
+        ])
+        tags = list(Tag.objects.values_list("id", flat=True))
+        Recipe.objects.bulk_create([
+            Recipe(
+                user=cls.user,
+                title=f"recipe {i}",
+                time_minutes=5,
+                price=5.00,
+            )
+            for i in range(RECIPES)
+        ])
+        recipe_ids = Recipe.objects.values_list("id", flat=True)
+        Through = Recipe.tags.through
+        Through.objects.bulk_create([
+            Through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tags, TAGS_PER_RECIPE)
+        ], batch_size=5000)
+        cls.tag_ids = rng.sample(tags, 3)
+
+    def report(self, name, func):
+        count = len(func())
+        seconds = best_of(ROUNDS, func)
+        print(f"\n{name:<28} {seconds * 1000:8.2f} ms  {count} rows")
+
+    def test_match_any(self):
+        recipes = Recipe.objects.filter(user=self.user)
+
+        self.report("any: join + DISTINCT", lambda: list(
+            recipes.filter(tags__id__in=self.tag_ids)
+            .distinct().values_list("id", flat=True)
+        ))
+        self.report("any: EXISTS", lambda: list(
+            recipes.with_related("tags", self.tag_ids)
+            .values_list("id", flat=True)
+        ))
+
+    def test_match_all(self):
+        recipes = Recipe.objects.filter(user=self.user)
+
+        def chained():
+            queryset = recipes
+            for tag_id in self.tag_ids:
+                queryset = queryset.filter(tags__id=tag_id)
+            return list(queryset.values_list("id", flat=True))
+
+        self.report("all: chained joins", chained)
+        self.report("all: GROUP BY/HAVING", lambda: list(
+            recipes.with_related("tags", self.tag_ids, match_all=True)
+            .values_list("id", flat=True)
+        ))
@@ -0,0 +1,161 @@
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+from PIL import Image, UnidentifiedImageError
+
+from recipes.images import generate_variants, render_variant
+from recipes.models import Recipe
+
+MEDIA_ROOT = tempfile.mkdtemp()
+VARIANTS = {"thumbnail": (20, 20), "medium": (80, 80)}
+
+
+def image_file(size=(160, 80), image_format="JPEG"):
+    file = tempfile.NamedTemporaryFile(suffix=".jpg")
+    Image.new("RGB", size).save(file, format=image_format)
+    file.seek(0)
+    return file
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    RECIPE_IMAGE_VARIANTS=VARIANTS,
+    RECIPE_IMAGE_WORKERS=0,
+)
+class ImageVariantTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "images@gmail.com",
+            "simple_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title="recipe",
+            time_minutes=5,
+            price=5.00,
+        )
+
+    def test_generate_variants(self):
+        with image_file() as file:
+            self.recipe.image.save("image.jpg", ContentFile(file.read()))
+
+        generate_variants(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.READY)
+        thumbnail = self.recipe.image_variants["thumbnail"]
+        medium = self.recipe.image_variants["medium"]
+        self.assertEqual((thumbnail["width"], thumbnail["height"]), (20, 10))
+        self.assertEqual((medium["width"], medium["height"]), (80, 40))
+        storage = self.recipe.image.storage
+        with storage.open(thumbnail["path"]) as file, Image.open(file) as img:
+            self.assertEqual(img.size, (20, 10))
+
+    def test_broken_image_fails(self):
+        self.recipe.image.save("image.jpg", ContentFile(b"not an image"))
+
+        with self.assertLogs("recipes.images", level="ERROR") as logs:
+            generate_variants(self.recipe.id)
+
+        [record] = logs.records
+        self.assertEqual(
+            record.getMessage(),
+            f"Can't generate variants of {self.recipe.image.name}",
+        )
+        self.assertIsInstance(record.exc_info[1], UnidentifiedImageError)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.FAILED)
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_replaced_image_not_recorded(self):
+        """Test variants of an image replaced mid-processing are dropped"""
+        with image_file() as file:
+            self.recipe.image.save("image.jpg", ContentFile(file.read()))
+
+        def replace_image(*args):
+            Recipe.objects.filter(pk=self.recipe.pk).update(image="newer.jpg")
+            return render_variant(*args)
+
+        with patch("recipes.images.render_variant", side_effect=replace_image):
+            generate_variants(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.NONE)
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_missing_image_not_left_pending(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_status=Recipe.ImageStatus.PENDING,
+        )
+
+        generate_variants(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.NONE)
+
+    def test_upload_without_image_rejected(self):
+        url = reverse("api_v1:recipe-upload-image", args=[self.recipe.id])
+
+        res = self.client.post(url, {}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.NONE)
+
+    def upload(self):
+        url = reverse("api_v1:recipe-upload-image", args=[self.recipe.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            with image_file() as file:
+                self.client.post(url, {"image": file}, format="multipart")
+        self.recipe.refresh_from_db()
+
+    def test_replaced_variants_deleted(self):
+        self.upload()
+        replaced = self.recipe.image_variants
+
+        self.upload()
+
+        storage = self.recipe.image.storage
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.READY)
+        for variant in replaced.values():
+            self.assertFalse(storage.exists(variant["path"]))
+        for variant in self.recipe.image_variants.values():
+            self.assertTrue(storage.exists(variant["path"]))
+
+    def test_upload_reports_pending_then_ready(self):
+        url = reverse("api_v1:recipe-upload-image", args=[self.recipe.id])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with image_file() as file:
+                res = self.client.post(url, {"image": file}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["image_status"], Recipe.ImageStatus.PENDING)
+        self.assertEqual(res.data["image_variants"], {})
+
+        for callback in callbacks:
+            callback()
+        res = self.client.get(
+            reverse("api_v1:recipe-detail", args=[self.recipe.id])
+        )
+
+        self.assertEqual(res.data["image_status"], Recipe.ImageStatus.READY)
+        self.assertEqual(set(res.data["image_variants"]), set(VARIANTS))
+        self.assertTrue(
+            res.data["image_variants"]["thumbnail"]["url"].startswith("http")
+        )
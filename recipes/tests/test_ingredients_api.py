@@ -45,7 +45,7 @@ class PrivateIngredientsAPITest(TestCase):
         ingredients = Ingredient.objects.all().order_by("-name")
         serializer = IngredientSerializer(ingredients, many=True)
 
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_ingredient_limited_to_user(self):
@@ -66,8 +66,8 @@ class PrivateIngredientsAPITest(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], ingredient.name)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], ingredient.name)
 
     def test_add_ingredient(self):
         payload = {
@@ -111,11 +111,12 @@ class PrivateIngredientsAPITest(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {"assigned_only": 1})
 
+        ingredient1.refresh_from_db()
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
 
     def test_retrieve_ingredients_assigned_unique(self):
         ingredient1 = Ingredient.objects.create(user=self.user, name="ingredient")
@@ -139,4 +140,39 @@ class PrivateIngredientsAPITest(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {"assigned_only": 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_retrieve_ingredients_recipe_count(self):
+        salt = Ingredient.objects.create(user=self.user, name="Salt")
+        pepper = Ingredient.objects.create(user=self.user, name="Pepper")
+        recipe = Recipe.objects.create(
+            title="recipe",
+            time_minutes=5,
+            price=10.00,
+            user=self.user
+        )
+        recipe.ingredients.add(salt)
+
+        res = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(res.data["results"], [
+            {"id": salt.id, "name": "Salt", "recipe_count": 1},
+            {"id": pepper.id, "name": "Pepper", "recipe_count": 0},
+        ])
+
+    def test_retrieve_ingredients_with_counts_alias(self):
+        salt = Ingredient.objects.create(user=self.user, name="Salt")
+        recipe = Recipe.objects.create(
+            title="Soup",
+            time_minutes=5,
+            price=5.00,
+            user=self.user,
+        )
+        recipe.ingredients.add(salt)
+
+        res = self.client.get(INGREDIENTS_URL, {"with_counts": 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"], [
+            {"id": salt.id, "name": "Salt", "recipe_count": 1},
+        ])
@@ -0,0 +1,158 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.cache import get_user_version
+from recipes.models import Recipe, Tag, Ingredient
+
+RECIPES_URL = reverse("api_v1:recipe-list")
+TAGS_URL = reverse("api_v1:tag-list")
+INGREDIENTS_URL = reverse("api_v1:ingredient-list")
+
+
+class UserVersionTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "version@test.com",
+            "simple",
+        )
+
+    def assertBumps(self, func):
+        before = get_user_version(self.user.pk)
+        result = func()
+        self.assertNotEqual(get_user_version(self.user.pk), before)
+        return result
+
+    def test_writes_bump_version(self):
+        tag = self.assertBumps(
+            lambda: Tag.objects.create(user=self.user, name="tag")
+        )
+        ingredient = self.assertBumps(
+            lambda: Ingredient.objects.create(user=self.user, name="salt")
+        )
+        recipe = self.assertBumps(lambda: Recipe.objects.create(
+            user=self.user,
+            title="recipe",
+            time_minutes=5,
+            price=5.00,
+        ))
+        self.assertBumps(lambda: recipe.tags.add(tag))
+        self.assertBumps(lambda: recipe.ingredients.add(ingredient))
+        self.assertBumps(lambda: tag.recipe_set.clear())
+        self.assertBumps(recipe.delete)
+
+    def test_bumped_again_on_commit(self):
+        """Test lists cached before a write commits are left behind"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name="tag")
+            before_commit = get_user_version(self.user.pk)
+
+        self.assertNotEqual(get_user_version(self.user.pk), before_commit)
+
+    def test_version_survives_lost_counter(self):
+        version = get_user_version(self.user.pk)
+        cache.clear()
+
+        self.assertNotEqual(get_user_version(self.user.pk), version)
+
+    def test_other_users_writes_ignored(self):
+        other = get_user_model().objects.create_user(
+            "other@test.com",
+            "simple",
+        )
+        version = get_user_version(self.user.pk)
+
+        Tag.objects.create(user=other, name="tag")
+
+        self.assertEqual(get_user_version(self.user.pk), version)
+
+
+class ListResponseCacheTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "cache@test.com",
+            "simple",
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name="Vegan")
+
+    def test_list_served_from_cache(self):
+        first = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(TAGS_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_if_none_match_not_modified(self):
+        res = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(res.content)
+
+    def test_write_invalidates(self):
+        res = self.client.get(TAGS_URL)
+        Tag.objects.create(user=self.user, name="Dessert")
+
+        new = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(new.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(new["ETag"], res["ETag"])
+        self.assertEqual(len(new.data["results"]), 2)
+
+    def test_m2m_change_invalidates_recipe_list(self):
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title="recipe",
+            time_minutes=5,
+            price=5.00,
+        )
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.data["results"][0]["tags"], [])
+
+        recipe.tags.add(self.tag)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data["results"][0]["tags"], [self.tag.id])
+
+    def test_query_string_cached_separately(self):
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title="recipe",
+            time_minutes=5,
+            price=5.00,
+        )
+        recipe.tags.add(self.tag)
+        Tag.objects.create(user=self.user, name="Unused")
+
+        everything = self.client.get(TAGS_URL)
+        assigned = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertNotEqual(everything["ETag"], assigned["ETag"])
+        self.assertEqual(len(everything.data["results"]), 2)
+        self.assertEqual(len(assigned.data["results"]), 1)
+
+    def test_cache_is_per_user(self):
+        self.client.get(INGREDIENTS_URL)
+        other = get_user_model().objects.create_user(
+            "other@test.com",
+            "simple",
+        )
+        Ingredient.objects.create(user=other, name="Salt")
+        self.client.force_authenticate(other)
+
+        res = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(len(res.data["results"]), 1)
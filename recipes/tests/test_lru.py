@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from drf_sample.lru import LRUCache
+
+
+class LRUCacheTests(TestCase):
+    def test_least_recently_used_evicted(self):
+        lru = LRUCache(max_size=2, timeout=60)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+
+        self.assertEqual(lru.get("a"), 1)
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("c"), 3)
+        self.assertEqual(len(lru), 2)
+
+    @patch("drf_sample.lru.time.monotonic")
+    def test_entries_expire(self, monotonic):
+        monotonic.return_value = 100
+        lru = LRUCache(max_size=2, timeout=10)
+        lru.set("a", 1)
+
+        monotonic.return_value = 109
+        self.assertEqual(lru.get("a"), 1)
+        monotonic.return_value = 110
+        self.assertIsNone(lru.get("a"))
@@ -0,0 +1,175 @@
+import re
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from drf_sample import metrics
+from recipes.models import Recipe, Tag
+
+RECIPES_URL = reverse("api_v1:recipe-list")
+METRICS_URL = reverse("metrics")
+
+
+def sample_recipe(user, **params):
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 10,
+        "price": 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def parse(text):
+    """Return {(name, labels): value} of the samples of `text`"""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        match = re.fullmatch(r"(\w+)(?:\{(.*)\})? (\S+)", line)
+        samples[match.group(1), match.group(2) or ""] = float(match.group(3))
+    return samples
+
+
+class MetricsTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "metrics@test.com",
+            "simple",
+        )
+        self.client.force_authenticate(self.user)
+        patcher = patch.object(metrics, "registry", metrics.Registry())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scrape(self):
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], metrics.CONTENT_TYPE)
+        return parse(res.content.decode())
+
+    def test_records_per_route(self):
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Vegan"))
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL, {"match": "invalid"})
+
+        samples = self.scrape()
+
+        labels = 'route="api_v1:recipe-list",method="GET"'
+        self.assertEqual(
+            samples["http_requests_total", f'{labels},status="200"'],
+            1,
+        )
+        self.assertEqual(
+            samples["http_requests_total", f'{labels},status="400"'],
+            1,
+        )
+        self.assertEqual(
+            samples["http_request_duration_seconds_count", labels],
+            2,
+        )
+        self.assertEqual(samples[
+            "http_request_duration_seconds_bucket",
+            f'{labels},le="+Inf"',
+        ], 2)
+        self.assertGreater(samples["http_request_db_queries_sum", labels], 0)
+        self.assertGreater(
+            samples["http_request_serializer_duration_seconds_sum", labels],
+            0,
+        )
+        self.assertGreater(samples["http_response_size_bytes_sum", labels], 0)
+
+    def test_unmatched_route(self):
+        self.client.get("/missing/")
+
+        samples = self.scrape()
+
+        self.assertEqual(samples[
+            "http_requests_total",
+            'route="unmatched",method="GET",status="404"',
+        ], 1)
+
+    def test_buckets_are_cumulative(self):
+        registry = metrics.Registry()
+        for value in (0, 3, 3, 500):
+            registry.observe("http_request_db_queries", "r", "GET", value)
+
+        samples = parse(metrics.render(*metrics.merge([registry.snapshot()])))
+
+        def bucket(le):
+            return samples[
+                "http_request_db_queries_bucket",
+                f'route="r",method="GET",le="{le}"',
+            ]
+
+        self.assertEqual(bucket("0.0"), 1)
+        self.assertEqual(bucket("2.0"), 1)
+        self.assertEqual(bucket("3.0"), 3)
+        self.assertEqual(bucket("200.0"), 3)
+        self.assertEqual(bucket("+Inf"), 4)
+        self.assertEqual(samples[
+            "http_request_db_queries_sum",
+            'route="r",method="GET"',
+        ], 506)
+
+    def test_aggregates_processes(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory):
+            other = metrics.Registry()
+            other.count_request("api_v1:recipe-list", "GET", 200)
+            with patch("os.getpid", return_value=-1):
+                other.flush(directory)
+            self.client.get(RECIPES_URL)
+
+            samples = self.scrape()
+
+        self.assertEqual(samples[
+            "http_requests_total",
+            'route="api_v1:recipe-list",method="GET",status="200"',
+        ], 2)
+
+    def test_reused_pid_keeps_exited_process_file(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory):
+            for _ in range(2):
+                # A process and the one reusing its pid after it exited
+                process = metrics.Registry()
+                process.count_request("api_v1:recipe-list", "GET", 200)
+                with patch("os.getpid", return_value=-1):
+                    process.flush(directory)
+
+            samples = self.scrape()
+
+        self.assertEqual(samples[
+            "http_requests_total",
+            'route="api_v1:recipe-list",method="GET",status="200"',
+        ], 2)
+
+    def test_forbidden_to_other_addresses(self):
+        res = self.client.get(METRICS_URL, REMOTE_ADDR="203.0.113.5")
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.0/8"])
+    def test_allowed_network(self):
+        res = self.client.get(METRICS_URL, REMOTE_ADDR="10.1.2.3")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN="secret")
+    def test_bearer_token(self):
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
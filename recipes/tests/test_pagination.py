@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag
+
+RECIPES_URL = reverse("api_v1:recipe-list")
+TAGS_URL = reverse("api_v1:tag-list")
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "pages@test.com",
+            "simple",
+        )
+        self.client.force_authenticate(self.user)
+        # Repeated titles make sure ties are broken by id
+        for i in range(7):
+            Recipe.objects.create(
+                user=self.user,
+                title=f"recipe {i % 3}",
+                time_minutes=5,
+                price=5.00,
+            )
+
+    def expected_ids(self):
+        return list(
+            Recipe.objects.filter(user=self.user)
+            .order_by("-title", "-id")
+            .values_list("id", flat=True)
+        )
+
+    def walk(self, url, params=None, link="next"):
+        ids = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids.extend(item["id"] for item in res.data["results"])
+            if not res.data[link]:
+                return ids, res
+            res = self.client.get(res.data[link])
+
+    def test_walk_forward(self):
+        ids, _ = self.walk(RECIPES_URL, {"page_size": 2})
+
+        self.assertEqual(ids, self.expected_ids())
+
+    def test_walk_backward(self):
+        _, last = self.walk(RECIPES_URL, {"page_size": 3})
+        self.assertIsNone(last.data["next"])
+
+        pages = [[item["id"] for item in last.data["results"]]]
+        res = last
+        while res.data["previous"]:
+            res = self.client.get(res.data["previous"])
+            pages.insert(0, [item["id"] for item in res.data["results"]])
+
+        self.assertEqual(sum(pages, []), self.expected_ids())
+
+    def test_first_page_has_no_previous(self):
+        res = self.client.get(RECIPES_URL, {"page_size": 2})
+
+        self.assertIsNone(res.data["previous"])
+        self.assertIsNotNone(res.data["next"])
+
+    def test_invalid_cursor(self):
+        res = self.client.get(RECIPES_URL, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_no_offset_or_count(self):
+        """Test deep pages are fetched with a keyset condition"""
+        first = self.client.get(RECIPES_URL, {"page_size": 2})
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(first.data["next"])
+
+        sql = " ".join(query["sql"].upper() for query in ctx.captured_queries)
+        self.assertNotIn("OFFSET", sql)
+        self.assertNotIn("COUNT(", sql)
+
+    def test_tags_paginated_by_name(self):
+        for name in ("a", "b", "b", "c"):
+            Tag.objects.create(user=self.user, name=name)
+
+        ids, _ = self.walk(TAGS_URL, {"page_size": 1})
+
+        expected = list(
+            Tag.objects.order_by("-name", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
@@ -0,0 +1,351 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings, skipUnlessDBFeature
+from django.urls import get_resolver, reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+from PIL import Image
+
+from drf_sample.nplusone import NPlusOneError
+from drf_sample.testing import QueryBudgetMixin
+from recipes.models import Recipe, RecipeQuerySet, Tag, Ingredient
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+# Most queries each endpoint of api/urls.py may run, whatever the size of
+# the user's data: {url name: {method: queries}}
+BUDGETS = {
+    "api-root": {"GET": 0},
+    "accounts_create": {"POST": 2},
+    "accounts_token": {"POST": 5},
+    "accounts_me": {"GET": 0, "PATCH": 4},
+    "tag-list": {"GET": 1, "POST": 1},
+    "tag-autocomplete": {"GET": 1},
+    "ingredient-list": {"GET": 1, "POST": 1},
+    "ingredient-autocomplete": {"GET": 1},
+    "recipe-list": {"GET": 3, "POST": 15},
+    "recipe-detail": {"GET": 3, "PATCH": 11, "DELETE": 8},
+    "recipe-export": {"GET": 3},
+    "recipe-facets": {"GET": 4},
+    "recipe-upload-image": {"POST": 4},
+}
+
+
+def url(name, *args):
+    return reverse(f"api_v1:{name}", args=args)
+
+
+def image_upload():
+    buffer = BytesIO()
+    Image.new("RGB", (10, 10)).save(buffer, format="PNG")
+    return SimpleUploadedFile(
+        "image.png",
+        buffer.getvalue(),
+        content_type="image/png",
+    )
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    # Count the queries of the views, not of the response cache
+    RECIPES_LIST_CACHE_TIMEOUT=0,
+)
+class EndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "budgets@test.com",
+            "simple",
+        )
+        self.client.force_authenticate(self.user)
+
+    def assertBudget(self, name, method, request, grow):
+        def checked_request():
+            res = request()
+            self.assertLess(res.status_code, 400, getattr(res, "data", None))
+            if res.streaming:
+                b"".join(res.streaming_content)
+
+        self.assertMaxQueries(BUDGETS[name][method], checked_request, grow)
+
+    def add_recipes(self, count):
+        """Add `count` recipes, each with a new tag and ingredient"""
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f"recipe {Recipe.objects.count()}",
+                time_minutes=10,
+                price=5.00,
+            )
+            recipe.tags.add(Tag.objects.create(user=self.user, name="Tag"))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name="Salt")
+            )
+
+    def add_users(self, count):
+        for i in range(count):
+            get_user_model().objects.create_user(
+                f"user{get_user_model().objects.count()}@test.com",
+                "simple",
+            )
+
+    def test_every_endpoint_has_budget(self):
+        names = {
+            name for name in get_resolver("api.urls").reverse_dict
+            if isinstance(name, str)
+        }
+
+        self.assertEqual(names, set(BUDGETS))
+
+    def test_api_root(self):
+        self.assertBudget(
+            "api-root",
+            "GET",
+            lambda: self.client.get(url("api-root")),
+            self.add_recipes,
+        )
+
+    def test_accounts(self):
+        emails = iter(range(100))
+        self.assertBudget(
+            "accounts_create",
+            "POST",
+            lambda: self.client.post(url("accounts_create"), {
+                "email": f"new{next(emails)}@test.com",
+                "password": "simple",
+                "name": "New",
+            }),
+            self.add_users,
+        )
+        self.assertBudget(
+            "accounts_token",
+            "POST",
+            lambda: self.client.post(url("accounts_token"), {
+                "email": "budgets@test.com",
+                "password": "simple",
+            }),
+            self.add_users,
+        )
+        self.assertBudget(
+            "accounts_me",
+            "GET",
+            lambda: self.client.get(url("accounts_me")),
+            self.add_recipes,
+        )
+        self.assertBudget(
+            "accounts_me",
+            "PATCH",
+            lambda: self.client.patch(url("accounts_me"), {
+                "name": "Renamed",
+                "password": "simple",
+            }),
+            self.add_recipes,
+        )
+
+    def test_tags_and_ingredients(self):
+        for name in ("tag", "ingredient"):
+            self.assertBudget(
+                f"{name}-list",
+                "GET",
+                lambda: self.client.get(url(f"{name}-list"), {
+                    "assigned_only": 1,
+                }),
+                self.add_recipes,
+            )
+            self.assertBudget(
+                f"{name}-list",
+                "POST",
+                lambda: self.client.post(url(f"{name}-list"), {"name": "New"}),
+                self.add_recipes,
+            )
+            self.assertBudget(
+                f"{name}-autocomplete",
+                "GET",
+                lambda: self.client.get(url(f"{name}-autocomplete"), {
+                    "q": "s",
+                }),
+                self.add_recipes,
+            )
+
+    def test_recipe_reads(self):
+        for name, params in (
+            ("recipe-list", {}),
+            ("recipe-list", {"search": "recipe", "max_price": 10}),
+            ("recipe-export", {}),
+            ("recipe-facets", {}),
+        ):
+            self.assertBudget(
+                name,
+                "GET",
+                lambda: self.client.get(url(name), params),
+                self.add_recipes,
+            )
+
+    def recipe_payload(self):
+        """Return `grow` adding tags and ingredients, and a payload using them"""
+        tags = []
+        ingredients = []
+
+        def grow(count):
+            for i in range(count):
+                tags.append(Tag.objects.create(user=self.user, name="Tag").pk)
+                ingredients.append(
+                    Ingredient.objects.create(user=self.user, name="Salt").pk
+                )
+
+        def payload():
+            return {
+                "title": "Stew",
+                "time_minutes": 60,
+                "price": "9.00",
+                "tags": tags,
+                "ingredients": ingredients,
+            }
+
+        return grow, payload
+
+    def test_recipe_create(self):
+        grow, payload = self.recipe_payload()
+
+        self.assertBudget(
+            "recipe-list",
+            "POST",
+            lambda: self.client.post(url("recipe-list"), payload(), "json"),
+            grow,
+        )
+
+    # Elsewhere the recipes of a bulk create are saved one by one
+    @skipUnlessDBFeature("can_return_rows_from_bulk_insert")
+    def test_recipe_bulk_create(self):
+        grow, payload = self.recipe_payload()
+
+        self.assertBudget(
+            "recipe-list",
+            "POST",
+            lambda: self.client.post(
+                url("recipe-list"),
+                [payload() for _ in range(len(payload()["tags"]))],
+                "json",
+            ),
+            grow,
+        )
+
+    def test_recipe_detail(self):
+        self.add_recipes(1)
+        recipe = Recipe.objects.get()
+        tags = list(recipe.tags.values_list("pk", flat=True))
+
+        def grow(count):
+            for i in range(count):
+                tag = Tag.objects.create(user=self.user, name="Tag")
+                recipe.tags.add(tag)
+                tags.append(tag.pk)
+
+        self.assertBudget(
+            "recipe-detail",
+            "GET",
+            lambda: self.client.get(url("recipe-detail", recipe.pk)),
+            grow,
+        )
+        self.assertBudget(
+            "recipe-detail",
+            "PATCH",
+            lambda: self.client.patch(
+                url("recipe-detail", recipe.pk),
+                {"title": "Renamed", "tags": tags[::2]},
+                "json",
+            ),
+            grow,
+        )
+        self.assertBudget(
+            "recipe-upload-image",
+            "POST",
+            lambda: self.client.post(
+                url("recipe-upload-image", recipe.pk),
+                {"image": image_upload()},
+                format="multipart",
+            ),
+            grow,
+        )
+
+    def test_recipe_delete(self):
+        recipes = []
+
+        def grow(count):
+            self.add_recipes(count)
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title="Doomed",
+                time_minutes=10,
+                price=5.00,
+            )
+            recipe.tags.set(Tag.objects.filter(user=self.user))
+            recipes.append(recipe)
+
+        self.assertBudget(
+            "recipe-detail",
+            "DELETE",
+            lambda: self.client.delete(
+                url("recipe-detail", recipes.pop().pk)
+            ),
+            grow,
+        )
+
+
+class NPlusOneDetectionTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "nplusone@test.com",
+            "simple",
+        )
+        self.client.force_authenticate(self.user)
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f"recipe {i}",
+                time_minutes=10,
+                price=5.00,
+            )
+            recipe.tags.add(Tag.objects.create(user=self.user, name="Tag"))
+
+    def without_prefetch(self):
+        """Drop the prefetches of the list's query plan"""
+        return patch.object(
+            RecipeQuerySet,
+            "for_list",
+            lambda queryset, fields=None: queryset,
+        )
+
+    def test_unprefetched_relation_raises(self):
+        with self.without_prefetch(), \
+                self.assertRaisesRegex(NPlusOneError, r"RecipeSerializer\."):
+            self.client.get(url("recipe-list"))
+
+    @override_settings(NPLUSONE_RAISE=False)
+    def test_logged_without_raise(self):
+        with self.without_prefetch(), \
+                self.assertLogs("drf_sample.nplusone", "WARNING") as logs:
+            res = self.client.get(url("recipe-list"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("RecipeSerializer.", logs.output[0])
+
+    def test_prefetched_list_passes(self):
+        res = self.client.get(url("recipe-list"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,139 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag, Ingredient
+
+RECIPES_URL = reverse("api_v1:recipe-list")
+TAGS_URL = reverse("api_v1:tag-list")
+INGREDIENTS_URL = reverse("api_v1:ingredient-list")
+
+# Plan lines that mean the database sorted the rows itself, or read a whole
+# table, instead of walking an index.
+BAD_PLANS = {
+    "sqlite": (
+        re.compile(r"USE TEMP B-TREE FOR (ORDER BY|DISTINCT)"),
+        re.compile(r"\bSCAN (TABLE )?\w+$"),
+    ),
+    "postgresql": (
+        re.compile(r"\bSort\b"),
+        re.compile(r"\bSeq Scan\b"),
+    ),
+}
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}")
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class ListQueryPlanTests(TestCase):
+    def setUp(self) -> None:
+        if connection.vendor not in BAD_PLANS:
+            self.skipTest(f"No plan checks for {connection.vendor}")
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "plans@test.com",
+            "simple",
+        )
+        self.client.force_authenticate(self.user)
+        other = get_user_model().objects.create_user(
+            "other@test.com",
+            "simple",
+        )
+        for owner in (self.user, other):
+            tag = Tag.objects.create(user=owner, name="tag")
+            ingredient = Ingredient.objects.create(user=owner, name="salt")
+            recipe = Recipe.objects.create(
+                user=owner,
+                title="recipe",
+                time_minutes=5,
+                price=5.00,
+            )
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+    def assertIndexedPlans(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, params)
+        self.assertTrue(ctx.captured_queries)
+
+        for query in ctx.captured_queries:
+            plan = explain(query["sql"])
+            for line in plan:
+                for pattern in BAD_PLANS[connection.vendor]:
+                    self.assertIsNone(
+                        pattern.search(line),
+                        f"{query['sql']}\n" + "\n".join(plan),
+                    )
+
+    def test_recipe_list_plan(self):
+        self.assertIndexedPlans(RECIPES_URL)
+
+    def test_recipe_list_next_page_plan(self):
+        Recipe.objects.create(
+            user=self.user,
+            title="another recipe",
+            time_minutes=5,
+            price=5.00,
+        )
+        res = self.client.get(RECIPES_URL, {"page_size": 1})
+        self.assertIndexedPlans(res.data["next"])
+
+    def test_recipe_list_filtered_by_tag_plan(self):
+        tag = Tag.objects.get(user=self.user)
+        self.assertIndexedPlans(RECIPES_URL, {"tags": tag.id})
+
+    def test_recipe_list_match_all_plan(self):
+        tag = Tag.objects.get(user=self.user)
+        ingredient = Ingredient.objects.get(user=self.user)
+        self.assertIndexedPlans(RECIPES_URL, {
+            "tags": tag.id,
+            "ingredients": ingredient.id,
+            "match": "all",
+        })
+
+    def assertRangeScan(self, params, index):
+        """
+        Test the recipe query walks `index` over the requested range. The
+        matching rows are sorted afterwards, so only full scans fail.
+        """
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPES_URL, params)
+
+        sql = ctx.captured_queries[0]["sql"]
+        plan = explain(sql)
+        self.assertIn(index, "\n".join(plan), f"{sql}\n" + "\n".join(plan))
+        full_scan = BAD_PLANS[connection.vendor][1]
+        for line in plan:
+            self.assertIsNone(full_scan.search(line), "\n".join(plan))
+
+    def test_recipe_list_price_range_plan(self):
+        self.assertRangeScan(
+            {"min_price": "1.00", "max_price": "10.00"},
+            "recipe_user_price_idx",
+        )
+
+    def test_recipe_list_time_range_plan(self):
+        self.assertRangeScan({"max_time": 30}, "recipe_user_time_idx")
+
+    def test_tag_list_plan(self):
+        self.assertIndexedPlans(TAGS_URL)
+
+    def test_ingredient_list_plan(self):
+        self.assertIndexedPlans(INGREDIENTS_URL)
+
+    def test_tag_list_assigned_plan(self):
+        self.assertIndexedPlans(TAGS_URL, {"assigned_only": 1})
@@ -0,0 +1,141 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag, Ingredient
+
+RECIPES_URL = reverse("api_v1:recipe-list")
+
+
+def sample_recipe(user, title="recipe"):
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=5,
+        price=5.00,
+    )
+
+
+class RecipeCountTests(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            "counts@test.com",
+            "simple",
+        )
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.quick = Tag.objects.create(user=self.user, name="Quick")
+        self.salt = Ingredient.objects.create(user=self.user, name="Salt")
+
+    def assertCounts(self, vegan, quick, salt=0):
+        for obj, expected in (
+            (self.vegan, vegan),
+            (self.quick, quick),
+            (self.salt, salt),
+        ):
+            obj.refresh_from_db()
+            self.assertEqual(obj.recipe_count, expected, obj.name)
+
+    def test_add_and_remove(self):
+        first = sample_recipe(self.user)
+        second = sample_recipe(self.user)
+        first.tags.add(self.vegan, self.quick)
+        second.tags.add(self.vegan)
+        second.ingredients.add(self.salt)
+        self.assertCounts(2, 1, 1)
+
+        # Already linked, so not counted twice
+        first.tags.add(self.vegan)
+        self.assertCounts(2, 1, 1)
+
+        first.tags.remove(self.vegan)
+        # Not linked, so nothing to take off
+        second.tags.remove(self.quick)
+        self.assertCounts(1, 1, 1)
+
+    def test_set_and_clear(self):
+        recipe = sample_recipe(self.user)
+        recipe.tags.set([self.vegan, self.quick])
+        recipe.tags.set([self.quick])
+        self.assertCounts(0, 1)
+
+        recipe.tags.clear()
+        self.assertCounts(0, 0)
+
+    def test_reverse_side(self):
+        first = sample_recipe(self.user)
+        second = sample_recipe(self.user)
+        self.vegan.recipe_set.add(first, second)
+        self.assertCounts(2, 0)
+
+        self.vegan.recipe_set.remove(first, second)
+        self.assertCounts(0, 0)
+
+        self.quick.recipe_set.add(first)
+        self.quick.recipe_set.clear()
+        self.assertCounts(0, 0)
+
+    def test_recipe_delete(self):
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.vegan)
+        recipe.ingredients.add(self.salt)
+        other = sample_recipe(self.user)
+        other.tags.add(self.vegan)
+
+        recipe.delete()
+        self.assertCounts(1, 0, 0)
+
+        Recipe.objects.all().delete()
+        self.assertCounts(0, 0, 0)
+
+    def test_bulk_create(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.post(RECIPES_URL, [
+            {
+                "title": f"recipe {i}",
+                "time_minutes": 5,
+                "price": "5.00",
+                "tags": [self.vegan.id],
+                "ingredients": [self.salt.id],
+            }
+            for i in range(3)
+        ], format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertCounts(3, 0, 3)
+
+
+class RepairRecipeCountsCommandTests(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            "repair@test.com",
+            "simple",
+        )
+
+    def test_repairs_drift(self):
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        untouched = Tag.objects.create(user=self.user, name="Quick")
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        Tag.objects.filter(pk=tag.pk).update(recipe_count=7)
+        Ingredient.objects.update(recipe_count=-1)
+
+        out = StringIO()
+        call_command("repair_recipe_counts", stdout=out)
+
+        self.assertIn("Repaired 1 tags", out.getvalue())
+        self.assertIn("Repaired 1 ingredients", out.getvalue())
+        for obj in (tag, untouched, ingredient):
+            obj.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+        self.assertEqual(untouched.recipe_count, 0)
+        self.assertEqual(ingredient.recipe_count, 1)
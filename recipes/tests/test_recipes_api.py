@@ -1,19 +1,26 @@
+import json
 import os
 import tempfile
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.utils.encoders import JSONEncoder
 from PIL import Image
 
 from recipes.models import Recipe, Tag, Ingredient
 from api.recipes.serializers import RecipeSerializer, RecipeDetailSerializer
+from api.recipes.views import RecipeViewSet
 
 RECIPES_URL = reverse("api_v1:recipe-list")
 RECIPES_DETAIL_URL = "api_v1:recipe-detail"
+EXPORT_URL = reverse("api_v1:recipe-export")
 
 
 def image_upload_url(recipe_id):
@@ -81,9 +88,9 @@ class PrivateRecipeAPITests(TestCase):
 
         res = self.client.get(RECIPES_URL)
 
-        recipes = Recipe.objects.all()
+        recipes = Recipe.objects.all().order_by("-title", "-id")
         serializer = RecipeSerializer(recipes, many=True)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_retrieve_list_of_recipes_limited_to_user(self):
@@ -101,8 +108,8 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_get_recipe_detail(self):
         recipe = sample_recipe(user=self.user)
@@ -294,9 +301,9 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecipeSerializer(r1)
         serializer2 = RecipeSerializer(r2)
         serializer3 = RecipeSerializer(r3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertIn(serializer2.data, res.data["results"])
+        self.assertNotIn(serializer3.data, res.data["results"])
 
     def test_filter_by_ingredients(self):
         r1 = sample_recipe(self.user, title="R1")
@@ -318,6 +325,537 @@ class RecipeImageUploadTests(TestCase):
             {"ingredients": f'{ingredient1.id}, {ingredient2.id}'}
         )
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertIn(serializer2.data, res.data["results"])
+        self.assertNotIn(serializer3.data, res.data["results"])
+
+
+class RecipeQueryCountTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "queries@gmail.com",
+            "simple_password",
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count):
+        tag = sample_tag(self.user)
+        ingredient = sample_ingredient(self.user)
+        for i in range(count):
+            recipe = sample_recipe(self.user, title=f"recipe {i}")
+            recipe.tags.add(tag, sample_tag(self.user, name=f"tag {i}"))
+            recipe.ingredients.add(ingredient)
+
+    def test_list_query_count_is_constant(self):
+        """Test listing recipes doesn't issue a query per recipe"""
+        self.create_recipes(2)
+        # recipes, tags and ingredients
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data["results"]), 2)
+
+        self.create_recipes(20)
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data["results"]), 22)
+
+    def test_list_includes_related_ids(self):
+        self.create_recipes(3)
+
+        res = self.client.get(RECIPES_URL)
+
+        recipes = Recipe.objects.filter(user=self.user).order_by("-title")
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_retrieve_query_count_is_constant(self):
+        """Test nested tags and ingredients are prefetched on retrieve"""
+        self.create_recipes(1)
+        recipe = Recipe.objects.get(user=self.user)
+        recipe.tags.add(*[
+            sample_tag(self.user, name=f"extra {i}") for i in range(10)
+        ])
+
+        with self.assertNumQueries(3):
+            res = self.client.get(get_detail_url(recipe.id))
+        self.assertEqual(len(res.data["tags"]), 12)
+        self.assertEqual(res.data, RecipeDetailSerializer(recipe).data)
+
+
+class RecipeMatchFilterTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "match@gmail.com",
+            "simple_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(self.user, name="Vegan")
+        self.quick = sample_tag(self.user, name="Quick")
+        self.salt = sample_ingredient(self.user, name="Salt")
+
+        self.both = sample_recipe(self.user, title="Vegan and quick")
+        self.both.tags.add(self.vegan, self.quick)
+        self.both.ingredients.add(self.salt)
+        self.vegan_only = sample_recipe(self.user, title="Vegan only")
+        self.vegan_only.tags.add(self.vegan)
+        self.untagged = sample_recipe(self.user, title="Untagged")
+
+    def titles(self, params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item["title"] for item in res.data["results"]]
+
+    def test_match_any_is_default(self):
+        """Test a recipe having several of the tags is listed once"""
+        tags = f"{self.vegan.id},{self.quick.id}"
+
+        self.assertEqual(
+            self.titles({"tags": tags}),
+            ["Vegan only", "Vegan and quick"],
+        )
+        self.assertEqual(
+            self.titles({"tags": tags, "match": "any"}),
+            ["Vegan only", "Vegan and quick"],
+        )
+
+    def test_match_all(self):
+        tags = f"{self.vegan.id},{self.quick.id}"
+
+        self.assertEqual(
+            self.titles({"tags": tags, "match": "all"}),
+            ["Vegan and quick"],
+        )
+        self.assertEqual(
+            self.titles({"tags": f"{self.vegan.id}", "match": "all"}),
+            ["Vegan only", "Vegan and quick"],
+        )
+
+    def test_match_all_ignores_repeated_ids(self):
+        tags = f"{self.vegan.id},{self.vegan.id}"
+
+        self.assertEqual(
+            self.titles({"tags": tags, "match": "all"}),
+            ["Vegan only", "Vegan and quick"],
+        )
+
+    def test_match_all_tags_and_ingredients(self):
+        params = {
+            "tags": f"{self.vegan.id}",
+            "ingredients": f"{self.salt.id}",
+            "match": "all",
+        }
+
+        self.assertEqual(self.titles(params), ["Vegan and quick"])
+
+    def test_match_all_limited_to_user(self):
+        other = get_user_model().objects.create_user(
+            "other@gmail.com",
+            "simple_password",
+        )
+        recipe = sample_recipe(other, title="Someone else's")
+        recipe.tags.add(self.vegan, self.quick)
+
+        self.assertEqual(
+            self.titles({
+                "tags": f"{self.vegan.id},{self.quick.id}",
+                "match": "all",
+            }),
+            ["Vegan and quick"],
+        )
+
+    def test_invalid_match(self):
+        res = self.client.get(RECIPES_URL, {
+            "tags": f"{self.vegan.id}",
+            "match": "some",
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("match", res.data)
+
+    def test_match_query_count(self):
+        for match in ("any", "all"):
+            # recipes, tags and ingredients
+            with self.assertNumQueries(3):
+                self.client.get(RECIPES_URL, {
+                    "tags": f"{self.vegan.id},{self.quick.id}",
+                    "match": match,
+                })
+
+
+class RecipeBulkCreateTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "bulk@gmail.com",
+            "simple_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.tag1 = sample_tag(self.user, name="tag1")
+        self.tag2 = sample_tag(self.user, name="tag2")
+        self.ingredient = sample_ingredient(self.user)
+
+    def payload(self, count):
+        return [
+            {
+                "title": f"bulk recipe {i}",
+                "time_minutes": 10 + i,
+                "price": "5.00",
+                "tags": [self.tag1.id, self.tag2.id],
+                "ingredients": [self.ingredient.id],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_recipes(self):
+        payload = self.payload(3)
+
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        for item, data in zip(payload, res.data):
+            recipe = Recipe.objects.get(id=data["id"])
+            self.assertEqual(recipe.user, self.user)
+            self.assertEqual(recipe.title, item["title"])
+            self.assertEqual(recipe.time_minutes, item["time_minutes"])
+            self.assertEqual(
+                sorted(recipe.tags.values_list("id", flat=True)),
+                item["tags"],
+            )
+            self.assertEqual(
+                list(recipe.ingredients.values_list("id", flat=True)),
+                item["ingredients"],
+            )
+            self.assertEqual(data, RecipeSerializer(recipe).data)
+
+    def test_bulk_create_shows_in_list(self):
+        self.client.get(RECIPES_URL)
+        self.client.post(RECIPES_URL, self.payload(2), format="json")
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data["results"]), 2)
+
+    def test_bulk_create_errors_by_index(self):
+        payload = self.payload(3)
+        payload[1]["title"] = ""
+        payload[2]["time_minutes"] = "soon"
+
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(res.data), {1, 2})
+        self.assertIn("title", res.data[1])
+        self.assertIn("time_minutes", res.data[2])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_size_limit(self):
+        with patch.object(RecipeViewSet, "max_bulk_create_size", 2):
+            res = self.client.post(RECIPES_URL, self.payload(3), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+
+class RecipeRelatedValidationTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "related@gmail.com",
+            "simple_password",
+        )
+        self.other = get_user_model().objects.create_user(
+            "other@gmail.com",
+            "simple_password",
+        )
+        self.client.force_authenticate(self.user)
+
+    def payload(self, **extra):
+        payload = {
+            "title": "recipe",
+            "time_minutes": 5,
+            "price": "5.00",
+            "tags": [],
+            "ingredients": [],
+        }
+        payload.update(extra)
+        return payload
+
+    def test_ids_resolved_in_one_query(self):
+        tags = [sample_tag(self.user, name=f"tag {i}") for i in range(5)]
+        ingredients = [
+            sample_ingredient(self.user, name=f"ingredient {i}")
+            for i in range(5)
+        ]
+        request = APIRequestFactory().post(RECIPES_URL)
+        request.user = self.user
+        serializer = RecipeSerializer(
+            data=self.payload(
+                tags=[tag.id for tag in tags],
+                ingredients=[ingredient.id for ingredient in ingredients],
+            ),
+            context={"request": request},
+        )
+
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data["tags"], tags)
+
+    def test_other_users_tags_rejected(self):
+        own = sample_tag(self.user)
+        foreign = sample_tag(self.other)
+
+        res = self.client.post(
+            RECIPES_URL,
+            self.payload(tags=[own.id, foreign.id, 999]),
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data["tags"]), 1)
+        self.assertIn(f"{foreign.id}, 999", res.data["tags"][0])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_other_users_ingredients_rejected(self):
+        foreign = sample_ingredient(self.other)
+
+        res = self.client.post(
+            RECIPES_URL,
+            self.payload(ingredients=[foreign.id]),
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("ingredients", res.data)
+
+    def test_incorrect_type(self):
+        res = self.client.post(
+            RECIPES_URL,
+            self.payload(tags=["abc"]),
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("tags", res.data)
+
+    def test_bulk_create_resolves_each_id_once(self):
+        tag = sample_tag(self.user)
+        payload = [self.payload(tags=[tag.id]) for _ in range(10)]
+        request = APIRequestFactory().post(RECIPES_URL)
+        request.user = self.user
+        serializer = RecipeSerializer(
+            data=payload,
+            many=True,
+            context={"request": request},
+        )
+
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+
+
+class RecipeSparseFieldsetTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "fields@gmail.com",
+            "simple_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(self.user, link="https://example.com")
+        self.recipe.tags.add(sample_tag(self.user))
+        self.recipe.ingredients.add(sample_ingredient(self.user))
+
+    def test_list_selected_fields(self):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                RECIPES_URL,
+                {"fields": "id,title,time_minutes"},
+            )
+
+        self.assertEqual(
+            list(res.data["results"][0]),
+            ["id", "title", "time_minutes"],
+        )
+        # no prefetches and no unused columns
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('"price"', ctx.captured_queries[0]["sql"])
+        self.assertNotIn('"link"', ctx.captured_queries[0]["sql"])
+
+    def test_list_omitted_fields(self):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {"omit": "tags,link"})
+
+        item = res.data["results"][0]
+        self.assertNotIn("tags", item)
+        self.assertNotIn("link", item)
+        self.assertEqual(item["ingredients"], [
+            ingredient.id for ingredient in self.recipe.ingredients.all()
+        ])
+        # recipes and ingredients only
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_detail_selected_fields(self):
+        res = self.client.get(
+            get_detail_url(self.recipe.id),
+            {"fields": "title,tags"},
+        )
+
+        self.assertEqual(list(res.data), ["title", "tags"])
+        self.assertEqual(res.data["tags"][0]["name"], "sample name")
+
+    def test_unknown_fields_ignored(self):
+        res = self.client.get(RECIPES_URL, {"fields": "title,secret"})
+
+        self.assertEqual(list(res.data["results"][0]), ["title"])
+
+    def test_writes_ignore_field_selection(self):
+        payload = {
+            "title": "new",
+            "time_minutes": 10,
+            "price": "3.00",
+            "tags": [],
+            "ingredients": [],
+        }
+
+        res = self.client.post(
+            f"{RECIPES_URL}?fields=id",
+            payload,
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["title"], "new")
+
+
+class RecipeExportTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "export@gmail.com",
+            "simple_password",
+        )
+        self.client.force_authenticate(self.user)
+        tag = sample_tag(self.user)
+        for i in range(5):
+            recipe = sample_recipe(self.user, title=f"recipe {i}")
+            recipe.tags.add(tag)
+        sample_recipe(
+            get_user_model().objects.create_user("other@gmail.com", "simple"),
+        )
+
+    def expected(self):
+        recipes = Recipe.objects.filter(user=self.user).order_by("-title")
+        return json.loads(json.dumps(
+            RecipeSerializer(recipes, many=True).data,
+            cls=JSONEncoder,
+        ))
+
+    def test_export_json_array(self):
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "application/json")
+        content = b"".join(res.streaming_content)
+        self.assertEqual(json.loads(content), self.expected())
+
+    def test_export_ndjson(self):
+        res = self.client.get(EXPORT_URL, {"format": "ndjson"})
+
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = b"".join(res.streaming_content).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.expected())
+
+    def test_export_empty(self):
+        Recipe.objects.filter(user=self.user).delete()
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(json.loads(b"".join(res.streaming_content)), [])
+
+    def test_export_serializes_in_batches(self):
+        with patch.object(RecipeViewSet, "export_batch_size", 2):
+            res = self.client.get(EXPORT_URL)
+            # one cursor, then tags and ingredients for each of 3 batches
+            with self.assertNumQueries(7):
+                content = b"".join(res.streaming_content)
+
+        self.assertEqual(len(json.loads(content)), 5)
+
+    def test_export_selected_fields(self):
+        res = self.client.get(EXPORT_URL, {"fields": "id,title"})
+
+        items = json.loads(b"".join(res.streaming_content))
+        self.assertEqual(list(items[0]), ["id", "title"])
+
+
+class RecipeRangeFilterTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "ranges@gmail.com",
+            "simple_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.quick_cheap = sample_recipe(
+            self.user,
+            title="Quick and cheap",
+            time_minutes=10,
+            price=5.00,
+        )
+        self.slow_cheap = sample_recipe(
+            self.user,
+            title="Slow and cheap",
+            time_minutes=90,
+            price=8.00,
+        )
+        self.quick_dear = sample_recipe(
+            self.user,
+            title="Quick and dear",
+            time_minutes=30,
+            price=25.00,
+        )
+
+    def titles(self, params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return {item["title"] for item in res.data["results"]}
+
+    def test_price_range(self):
+        self.assertEqual(
+            self.titles({"max_price": "10"}),
+            {"Quick and cheap", "Slow and cheap"},
+        )
+        self.assertEqual(
+            self.titles({"min_price": "8.00", "max_price": "25.00"}),
+            {"Slow and cheap", "Quick and dear"},
+        )
+
+    def test_time_range(self):
+        self.assertEqual(
+            self.titles({"max_time": 30}),
+            {"Quick and cheap", "Quick and dear"},
+        )
+        self.assertEqual(self.titles({"min_time": 31}), {"Slow and cheap"})
+
+    def test_ranges_combined_with_tags(self):
+        tag = sample_tag(self.user, name="Dinner")
+        self.quick_cheap.tags.add(tag)
+        self.quick_dear.tags.add(tag)
+
+        self.assertEqual(
+            self.titles({"tags": tag.id, "max_time": 30, "max_price": 10}),
+            {"Quick and cheap"},
+        )
+
+    def test_invalid_range(self):
+        res = self.client.get(RECIPES_URL, {
+            "max_price": "cheap",
+            "min_time": "soon",
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("max_price", res.data)
+        self.assertIn("min_time", res.data)
@@ -0,0 +1,174 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from drf_sample import replicas
+from drf_sample.replicas import ReplicaRouter
+from recipes.models import Recipe
+
+RECIPES_URL = reverse("api_v1:recipe-list")
+TAGS_URL = reverse("api_v1:tag-list")
+ME_URL = reverse("api_v1:accounts_me")
+
+
+@skipUnless(
+    "replica" in settings.DATABASES,
+    "Needs a 'replica' database, see drf_sample.settings.test",
+)
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_STICKY_SECONDS=60)
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "replica@test.com",
+            "simple",
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+            user=self.user,
+            title="Soup",
+            time_minutes=5,
+            price=5.00,
+        )
+
+    def request(self, method, url, data=None):
+        """Return the response and the SQL run on (primary, replica)"""
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica"]) as replica:
+            res = getattr(self.client, method)(url, data, format="json")
+        return res, (
+            [query["sql"] for query in primary.captured_queries],
+            [query["sql"] for query in replica.captured_queries],
+        )
+
+    def test_reads_go_to_replica(self):
+        for url in (RECIPES_URL, TAGS_URL):
+            res, (primary, replica) = self.request("get", url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertTrue(replica, url)
+            self.assertEqual(primary, [], url)
+
+        # The user was loaded by authentication, so there's nothing to read
+        res, (primary, _) = self.request("get", ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(primary, [])
+
+    def test_writes_go_to_primary(self):
+        res, (primary, replica) = self.request("post", TAGS_URL, {
+            "name": "Vegan",
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_reads_stick_to_primary_after_write(self):
+        self.request("post", TAGS_URL, {"name": "Vegan"})
+
+        res, (primary, replica) = self.request("get", RECIPES_URL)
+
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_pin_is_per_user(self):
+        other = get_user_model().objects.create_user(
+            "other@test.com",
+            "simple",
+        )
+        replicas.pin_to_primary(other.pk)
+
+        _, (primary, replica) = self.request("get", RECIPES_URL)
+
+        self.assertTrue(replica)
+
+    def test_pin_expires(self):
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            self.request("post", TAGS_URL, {"name": "Vegan"})
+
+        _, (primary, replica) = self.request("get", RECIPES_URL)
+
+        self.assertTrue(replica)
+
+    def test_routing_reset_after_request(self):
+        self.request("get", RECIPES_URL)
+
+        self.assertIsNone(replicas.current_replica())
+        self.assertIsNone(ReplicaRouter().db_for_read(Recipe))
+
+    def test_primary_inside_transaction(self):
+        replicas.use_replica()
+        try:
+            self.assertEqual(ReplicaRouter().db_for_read(Recipe), "replica")
+            with transaction.atomic():
+                self.assertIsNone(ReplicaRouter().db_for_read(Recipe))
+        finally:
+            replicas.reset()
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        _, (primary, replica) = self.request("get", RECIPES_URL)
+
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+
+@skipUnless(
+    "shard1" in settings.DATABASES,
+    "Needs a 'shard1' database, see drf_sample.settings.test",
+)
+@override_settings(DATABASE_REPLICAS=["shard1"], REPLICA_STICKY_SECONDS=60)
+class LaggingReplicaTests(TransactionTestCase):
+    """
+    The 'replica' database mirrors the primary under test, so an empty
+    database stands in for a replica that hasn't caught up at all.
+    """
+
+    databases = {"default", "shard1"}
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "lagging@test.com",
+            "simple",
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_writer_reads_own_writes(self):
+        client = self.client_for(self.user)
+        client.post(TAGS_URL, {"name": "Vegan"})
+
+        res = client.get(TAGS_URL)
+
+        self.assertEqual(
+            [tag["name"] for tag in res.data["results"]],
+            ["Vegan"],
+        )
+
+    def test_reads_lag_without_pin(self):
+        """Test what a worker not sharing the pin cache would serve"""
+        client = self.client_for(self.user)
+        client.post(TAGS_URL, {"name": "Vegan"})
+        replicas.get_pin_cache().clear()
+
+        res = client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"], [])
@@ -0,0 +1,188 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes import search
+from recipes.models import Recipe
+
+RECIPES_URL = reverse("api_v1:recipe-list")
+
+
+def sample_recipe(user, title):
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=5,
+        price=5.00,
+    )
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self) -> None:
+        if connection.vendor != "sqlite":
+            self.skipTest("The FTS5 table only exists on SQLite")
+        self.user = get_user_model().objects.create_user(
+            "index@test.com",
+            "simple",
+        )
+
+    def matches(self, text):
+        return list(
+            search.search(Recipe.objects.all(), text)
+            .values_list("title", flat=True)
+        )
+
+    def test_fts5_query_escapes_operators(self):
+        self.assertEqual(
+            search.fts5_query('cake" OR title:*'),
+            '"cake"* "OR"* "title"*',
+        )
+
+    def test_save_indexes_title(self):
+        recipe = sample_recipe(self.user, "Chocolate cake")
+        self.assertEqual(self.matches("chocolate"), ["Chocolate cake"])
+
+        recipe.title = "Lemon tart"
+        recipe.save()
+
+        self.assertEqual(self.matches("chocolate"), [])
+        self.assertEqual(self.matches("lemon"), ["Lemon tart"])
+
+    def test_delete_unindexes_title(self):
+        recipe = sample_recipe(self.user, "Chocolate cake")
+        recipe.delete()
+
+        self.assertEqual(self.matches("chocolate"), [])
+
+    def test_lookup_uses_index(self):
+        """Test a search probes the FTS index instead of scanning titles"""
+        sample_recipe(self.user, "Chocolate cake")
+        queryset = search.search(
+            Recipe.objects.filter(user=self.user),
+            "chocolate",
+        )
+
+        with connection.cursor() as cursor:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = [row[-1] for row in cursor.fetchall()]
+
+        self.assertTrue(
+            any("VIRTUAL TABLE INDEX" in line for line in plan),
+            plan,
+        )
+        for line in plan:
+            self.assertNotRegex(line, r"^SCAN (TABLE )?recipes_recipe$")
+
+
+class RecipeSearchAPITests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "search@test.com",
+            "simple",
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, text, **params):
+        return self.client.get(RECIPES_URL, {"search": text, **params})
+
+    def test_search_titles(self):
+        sample_recipe(self.user, "Chocolate cake")
+        sample_recipe(self.user, "Carrot cake")
+        sample_recipe(self.user, "Lemon tart")
+
+        res = self.search("cake")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {item["title"] for item in res.data["results"]},
+            {"Chocolate cake", "Carrot cake"},
+        )
+
+    def test_search_limited_to_user(self):
+        other = get_user_model().objects.create_user(
+            "other@test.com",
+            "simple",
+        )
+        sample_recipe(other, "Chocolate cake")
+
+        res = self.search("chocolate")
+
+        self.assertEqual(res.data["results"], [])
+
+    def test_search_ranked(self):
+        sample_recipe(self.user, "Cake with a very long title about apples")
+        sample_recipe(self.user, "Cake cake")
+
+        res = self.search("cake")
+
+        self.assertEqual(res.data["results"][0]["title"], "Cake cake")
+
+    def test_search_paginated(self):
+        for i in range(5):
+            sample_recipe(self.user, f"Soup number {i}")
+        sample_recipe(self.user, "Salad")
+
+        titles = []
+        res = self.search("soup", page_size=2)
+        while True:
+            titles.extend(item["title"] for item in res.data["results"])
+            if not res.data["next"]:
+                break
+            res = self.client.get(res.data["next"])
+
+        self.assertEqual(len(titles), 5)
+        self.assertEqual(len(set(titles)), 5)
+
+    def test_search_pages_stable_across_other_users_writes(self):
+        """Test the rank behind a cursor doesn't move with the index"""
+        titles = [
+            "Soup",
+            "Tomato soup",
+            "Cold cucumber soup",
+            "Soup of the day",
+            "Thick pea soup with ham",
+        ]
+        for title in titles:
+            sample_recipe(self.user, title)
+        other = get_user_model().objects.create_user(
+            "other@test.com",
+            "simple",
+        )
+
+        seen = []
+        res = self.search("soup", page_size=2)
+        while True:
+            seen.extend(item["title"] for item in res.data["results"])
+            if not res.data["next"]:
+                break
+            # Shifts the index statistics that bm25() ranks with
+            for i in range(20):
+                sample_recipe(other, f"Lemon tart {i}")
+            res = self.client.get(res.data["next"])
+
+        self.assertCountEqual(seen, titles)
+
+    def test_search_without_words(self):
+        sample_recipe(self.user, "Chocolate cake")
+
+        res = self.search("!!!")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"], [])
+
+    def test_search_query_count(self):
+        for i in range(10):
+            sample_recipe(self.user, f"Soup {i}")
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.search("soup")
+
+        # search, then tags and ingredients prefetches
+        self.assertEqual(len(ctx.captured_queries), 3)
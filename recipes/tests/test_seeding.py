@@ -0,0 +1,138 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from recipes import search, seeding
+from recipes.models import Tag, Ingredient, Recipe
+
+
+def generate(seed=0, **options):
+    User = get_user_model()
+    return seeding.generate(
+        **{
+            "users": 3,
+            "tags": 5,
+            "ingredients": 8,
+            "recipes": 10,
+            "password_hash": make_password("simple"),
+            "first_ids": seeding.next_ids((User, Tag, Ingredient, Recipe)),
+            "seed": seed,
+            **options,
+        }
+    )
+
+
+def described(rows):
+    """The field values of `rows`, comparable between generations"""
+    return [
+        (type(row).__name__, {
+            field.attname: getattr(row, field.attname)
+            for field in row._meta.concrete_fields
+            if field.attname != "password"
+        })
+        for row in rows
+    ]
+
+
+class GenerateTests(TestCase):
+    def test_deterministic(self):
+        self.assertEqual(described(generate()), described(generate()))
+        self.assertNotEqual(described(generate()), described(generate(1)))
+
+    def test_users_independent_of_others(self):
+        """Test a user's data doesn't depend on how many users follow"""
+        fewer = described(generate(users=2))
+        more = described(generate(users=3))
+
+        self.assertEqual(fewer, more[:len(fewer)])
+
+    def test_ids_follow_existing_rows(self):
+        user = get_user_model().objects.create_user("old@test.com", "simple")
+
+        rows = list(generate(users=1))
+
+        self.assertEqual(rows[0].pk, user.pk + 1)
+
+
+class InsertTests(TestCase):
+    def test_inserts_everything(self):
+        inserted = seeding.insert(generate(), batch_size=7)
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertEqual(Tag.objects.count(), 15)
+        self.assertEqual(Ingredient.objects.count(), 24)
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertEqual(inserted[Recipe], 30)
+        self.assertEqual(
+            inserted[Recipe.tags.through],
+            Recipe.tags.through.objects.count(),
+        )
+        for recipe in Recipe.objects.prefetch_related("tags", "ingredients"):
+            for related in (*recipe.tags.all(), *recipe.ingredients.all()):
+                self.assertEqual(related.user_id, recipe.user_id)
+
+    def test_recipe_counts_consistent(self):
+        seeding.insert(generate())
+
+        self.assertEqual(Tag.objects.repair_recipe_counts(), 0)
+        self.assertEqual(Ingredient.objects.repair_recipe_counts(), 0)
+
+    def test_shared_password(self):
+        seeding.insert(generate())
+
+        for user in get_user_model().objects.all():
+            self.assertTrue(user.check_password("simple"))
+
+    def test_recipes_searchable(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("The FTS5 table only exists on SQLite")
+        seeding.insert(generate())
+        recipe = Recipe.objects.first()
+
+        matches = search.search(Recipe.objects.all(), recipe.title)
+
+        self.assertIn(recipe, matches)
+
+    def test_later_rows_get_new_ids(self):
+        seeding.insert(generate())
+
+        recipe = Recipe.objects.create(
+            user=get_user_model().objects.first(),
+            title="Stew",
+            time_minutes=10,
+            price=5.00,
+        )
+
+        self.assertGreater(recipe.pk, 30)
+
+
+class SeedCommandTests(TestCase):
+    def test_seed(self):
+        out = StringIO()
+
+        call_command(
+            "seed",
+            "--users=2",
+            "--tags=3",
+            "--ingredients=4",
+            "--recipes=5",
+            "--batch-size=10",
+            "--password=secret",
+            stdout=out,
+        )
+
+        self.assertIn("Created 2 users", out.getvalue())
+        self.assertIn("Created 10 recipes", out.getvalue())
+        self.assertEqual(Recipe.objects.count(), 10)
+        self.assertTrue(
+            get_user_model().objects.first().check_password("secret")
+        )
+
+    @override_settings(RECIPE_SHARDS=["shard1", "shard2"])
+    def test_refused_with_shards(self):
+        with self.assertRaises(CommandError):
+            call_command("seed", stdout=StringIO())
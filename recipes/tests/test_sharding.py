@@ -0,0 +1,246 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes import sharding
+from recipes.models import Tag, Ingredient, Recipe, UserShard
+from recipes.sharding import ShardRouter
+
+RECIPES_URL = reverse("api_v1:recipe-list")
+TAGS_URL = reverse("api_v1:tag-list")
+SHARDS = ["shard1", "shard2"]
+
+
+def detail_url(recipe_id):
+    return reverse("api_v1:recipe-detail", args=[recipe_id])
+
+
+@skipUnless(
+    set(SHARDS) <= set(settings.DATABASES),
+    "Needs 'shard1' and 'shard2' databases, see drf_sample.settings.test",
+)
+@override_settings(RECIPE_SHARDS=SHARDS)
+class ShardingTests(TransactionTestCase):
+    databases = {"default", *SHARDS}
+
+    def setUp(self) -> None:
+        cache.clear()
+        # One user placed on each shard
+        self.users = {}
+        while len(self.users) < len(SHARDS):
+            user = get_user_model().objects.create_user(
+                f"user{get_user_model().objects.count()}@test.com",
+                "simple",
+            )
+            self.users.setdefault(sharding.shard_for_user(user.pk), user)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def create_recipe(self, user, title="Soup"):
+        client = self.client_for(user)
+        tag = client.post(TAGS_URL, {"name": "Vegan"}).data
+        res = client.post(RECIPES_URL, {
+            "title": title,
+            "time_minutes": 5,
+            "price": "5.00",
+            "tags": [tag["id"]],
+            "ingredients": [],
+        }, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED, res.data)
+        return res.data
+
+    def test_data_goes_to_user_shard(self):
+        for shard, user in self.users.items():
+            self.create_recipe(user, title=f"Soup on {shard}")
+
+        for shard, user in self.users.items():
+            recipes = Recipe.objects.using(shard)
+            self.assertEqual(
+                list(recipes.values_list("title", flat=True)),
+                [f"Soup on {shard}"],
+            )
+            self.assertEqual(
+                Tag.objects.using(shard).get().recipe_count,
+                1,
+            )
+        self.assertFalse(Recipe.objects.using("default").exists())
+        self.assertFalse(Tag.objects.using("default").exists())
+
+    def test_views_read_user_shard(self):
+        recipes = {
+            shard: self.create_recipe(user, title=f"Soup on {shard}")
+            for shard, user in self.users.items()
+        }
+
+        for shard, user in self.users.items():
+            client = self.client_for(user)
+            res = client.get(RECIPES_URL)
+            self.assertEqual(
+                [item["title"] for item in res.data["results"]],
+                [f"Soup on {shard}"],
+            )
+
+            res = client.get(detail_url(recipes[shard]["id"]))
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.data["tags"][0]["name"], "Vegan")
+
+            res = client.get(RECIPES_URL, {"search": "soup"})
+            self.assertEqual(len(res.data["results"]), 1)
+
+    def test_routing_reset_after_request(self):
+        user = self.users["shard2"]
+        self.client_for(user).get(RECIPES_URL)
+
+        self.assertIsNone(sharding.current_user_id())
+        self.assertIsNone(ShardRouter().db_for_read(Recipe))
+
+    def test_for_user(self):
+        user = self.users["shard2"]
+        self.create_recipe(user)
+
+        with sharding.for_user(user.pk) as shard:
+            self.assertEqual(shard, "shard2")
+            self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(Recipe.objects.count(), 0)
+
+    def test_move_user(self):
+        user = self.users["shard1"]
+        self.create_recipe(user)
+        out = StringIO()
+
+        call_command("move_user_shard", user.pk, "shard2", stdout=out)
+
+        self.assertIn("Moved 1 recipes, 1 tags and 0 ingredients", out.getvalue())
+        self.assertEqual(sharding.shard_for_user(user.pk), "shard2")
+        self.assertEqual(UserShard.objects.get(user=user).alias, "shard2")
+        for model in (Recipe, Tag):
+            self.assertFalse(
+                model.objects.using("shard1").filter(user=user).exists()
+            )
+        self.assertEqual(Tag.objects.using("shard2").get().recipe_count, 1)
+
+        client = self.client_for(user)
+        res = client.get(RECIPES_URL, {"search": "soup"})
+        self.assertEqual(len(res.data["results"]), 1)
+        res = client.get(detail_url(res.data["results"][0]["id"]))
+        self.assertEqual(res.data["tags"][0]["name"], "Vegan")
+
+    def test_ids_unique_across_shards(self):
+        recipes = [
+            self.create_recipe(user, title=f"Soup on {shard}")
+            for shard, user in self.users.items()
+        ]
+
+        self.assertNotEqual(recipes[0]["id"], recipes[1]["id"])
+        self.assertNotEqual(recipes[0]["tags"], recipes[1]["tags"])
+
+    def test_move_keeps_ids(self):
+        user = self.users["shard1"]
+        other = self.users["shard2"]
+        recipe = self.create_recipe(user)
+        self.create_recipe(other, title="Stew")
+
+        call_command("move_user_shard", user.pk, "shard2", stdout=StringIO())
+
+        res = self.client_for(user).get(detail_url(recipe["id"]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag["id"] for tag in res.data["tags"]],
+            recipe["tags"],
+        )
+
+    def test_move_renumbers_taken_ids(self):
+        """Test rows inserted before ids were allocated across shards"""
+        user = self.users["shard1"]
+        other = self.users["shard2"]
+        recipe = self.create_recipe(user)
+        with override_settings(RECIPE_SHARDS=[]):
+            Tag.objects.using("shard2").create(
+                pk=recipe["tags"][0],
+                user=other,
+                name="Spicy",
+            )
+        out = StringIO()
+
+        call_command("move_user_shard", user.pk, "shard2", stdout=out)
+
+        self.assertIn("1 of them had ids taken on shard2", out.getvalue())
+        res = self.client_for(user).get(detail_url(recipe["id"]))
+        self.assertEqual(res.data["tags"][0]["name"], "Vegan")
+        self.assertNotEqual(res.data["tags"][0]["id"], recipe["tags"][0])
+        self.assertEqual(
+            Tag.objects.using("shard2").get(pk=recipe["tags"][0]).name,
+            "Spicy",
+        )
+
+    def test_move_seen_by_other_processes(self):
+        """Test a move is seen without relying on this process's cache"""
+        user = self.users["shard1"]
+
+        # As the move_user_shard command, in its own process, leaves it
+        UserShard.objects.filter(user=user).update(alias="shard2")
+
+        self.assertEqual(sharding.shard_for_user(user.pk), "shard2")
+
+    def test_placement_kept_when_shards_added(self):
+        placed = {
+            user.pk: shard for shard, user in self.users.items()
+        }
+
+        with override_settings(RECIPE_SHARDS=[*SHARDS, "default"]):
+            for user_id, shard in placed.items():
+                self.assertEqual(sharding.shard_for_user(user_id), shard)
+
+    def test_move_user_keeps_others(self):
+        user = self.users["shard1"]
+        other = self.users["shard2"]
+        self.create_recipe(user)
+        self.create_recipe(other, title="Stew")
+
+        call_command("move_user_shard", user.pk, "shard2", stdout=StringIO())
+
+        res = self.client_for(other).get(RECIPES_URL)
+        self.assertEqual(
+            [item["title"] for item in res.data["results"]],
+            ["Stew"],
+        )
+        res = self.client_for(user).get(RECIPES_URL)
+        self.assertEqual(
+            [item["title"] for item in res.data["results"]],
+            ["Soup"],
+        )
+
+    def test_move_to_unknown_shard(self):
+        user = self.users["shard1"]
+
+        with self.assertRaises(CommandError):
+            call_command("move_user_shard", user.pk, "default")
+
+    def test_delete_user_clears_shard(self):
+        user = self.users["shard2"]
+        self.create_recipe(user)
+
+        user.delete()
+
+        for model in (Recipe, Tag, Ingredient):
+            self.assertFalse(model.objects.using("shard2").exists())
+
+    @override_settings(RECIPE_SHARDS=[])
+    def test_without_shards(self):
+        user = self.users["shard2"]
+        self.create_recipe(user)
+
+        self.assertEqual(Recipe.objects.using("default").count(), 1)
+        self.assertFalse(Recipe.objects.using("shard2").exists())
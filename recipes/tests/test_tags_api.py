@@ -47,7 +47,7 @@ class PrivateTagsAPITests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_tags_limited_to_authenticated_user(self):
         Tag.objects.create(
@@ -61,11 +61,11 @@ class PrivateTagsAPITests(TestCase):
 
         res = self.client.get(TAGS_URL)
 
-        tags = Tag.objects.filter(user=self.user)
+        tags = Tag.objects.filter(user=self.user).order_by("-name")
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_create_tag_successful(self):
         payload = {
@@ -104,10 +104,11 @@ class PrivateTagsAPITests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
+        tag1.refresh_from_db()
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
 
     def test_retrieve_tags_assigned_unique(self):
         tag = Tag.objects.create(user=self.user, name="Breakfast")
@@ -129,4 +130,61 @@ class PrivateTagsAPITests(TestCase):
 
         res = self.client.get(TAGS_URL, {"assigned_only": 1})
 
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_retrieve_tags_recipe_count(self):
+        breakfast = Tag.objects.create(user=self.user, name="Breakfast")
+        lunch = Tag.objects.create(user=self.user, name="Lunch")
+        dinner = Tag.objects.create(user=self.user, name="Dinner")
+        for title in ("Eggs", "Toast"):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=5.00,
+                user=self.user,
+            )
+            recipe.tags.add(breakfast)
+        recipe.tags.add(lunch)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data["results"], [
+            {"id": lunch.id, "name": "Lunch", "recipe_count": 1},
+            {"id": dinner.id, "name": "Dinner", "recipe_count": 0},
+            {"id": breakfast.id, "name": "Breakfast", "recipe_count": 2},
+        ])
+
+    def test_retrieve_tags_assigned_recipe_count(self):
+        tag = Tag.objects.create(user=self.user, name="Breakfast")
+        Tag.objects.create(user=self.user, name="Lunch")
+        recipe = Recipe.objects.create(
+            title="Eggs",
+            time_minutes=5,
+            price=5.00,
+            user=self.user,
+        )
+        recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual(res.data["results"], [
+            {"id": tag.id, "name": "Breakfast", "recipe_count": 1},
+        ])
+
+    def test_retrieve_tags_with_counts_alias(self):
+        tag = Tag.objects.create(user=self.user, name="Breakfast")
+        recipe = Recipe.objects.create(
+            title="Eggs",
+            time_minutes=5,
+            price=5.00,
+            user=self.user,
+        )
+        recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {"with_counts": 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"], [
+            {"id": tag.id, "name": "Breakfast", "recipe_count": 1},
+        ])
@@ -0,0 +1,163 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadhandler import SkipFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+from PIL import Image
+
+from recipes.models import Recipe
+from api.recipes.uploads import ImageUploadHandler
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_bytes(size=(10, 10), image_format="PNG"):
+    buffer = BytesIO()
+    Image.new("RGB", size).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def upload(content, name="image.png"):
+    return SimpleUploadedFile(name, content, content_type="image/png")
+
+
+class ImageUploadHandlerTests(TestCase):
+    def start(self, handler):
+        handler.new_file("image", "image.png", "image/png", None)
+
+    def test_declared_length_over_limit(self):
+        handler = ImageUploadHandler(max_size=1024)
+
+        post, files = handler.handle_raw_input(
+            None, {}, 1024 * 1024, b"boundary"
+        )
+
+        self.assertFalse(files)
+        self.assertIsNotNone(handler.error)
+
+    def test_non_image_rejected_on_first_chunk(self):
+        handler = ImageUploadHandler()
+        self.start(handler)
+
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b"<?php echo 'hello'; ?>" * 10, 0)
+        self.assertTrue(handler.file.closed)
+
+    def test_stream_over_limit_rejected(self):
+        handler = ImageUploadHandler(max_size=100)
+        self.start(handler)
+        content = image_bytes()
+
+        handler.receive_data_chunk(content[:64], 0)
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b"\0" * 64, 64)
+
+    def test_dimensions_checked_from_header(self):
+        """Test a bomb is refused before the rest of the file arrives"""
+        handler = ImageUploadHandler(max_pixels=100)
+        handler.header_size = 64
+        self.start(handler)
+
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(image_bytes(size=(20, 20))[:64], 0)
+
+    def test_partial_header_parsed_once(self):
+        """Test an inconclusive header isn't parsed again for every chunk"""
+        handler = ImageUploadHandler()
+        handler.header_size = 64
+        self.start(handler)
+        content = b"\x89PNG\r\n\x1a\n" + b"\0" * 56
+
+        with patch.object(Image, "open", wraps=Image.open) as image_open:
+            for start in range(0, 256, 64):
+                handler.receive_data_chunk(content, start)
+
+        self.assertEqual(image_open.call_count, 1)
+
+    def test_valid_image_accepted(self):
+        handler = ImageUploadHandler()
+        self.start(handler)
+        content = image_bytes()
+
+        handler.receive_data_chunk(content, 0)
+        uploaded = handler.file_complete(len(content))
+
+        self.assertIsNone(handler.error)
+        self.assertEqual(uploaded.read(), content)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageUploadAPITests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "uploads@gmail.com",
+            "simple_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title="recipe",
+            time_minutes=5,
+            price=5.00,
+        )
+        self.url = reverse("api_v1:recipe-upload-image", args=[self.recipe.id])
+
+    def assertRejected(self, res):
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("image", res.data)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_upload_image(self):
+        res = self.client.post(
+            self.url,
+            {"image": upload(image_bytes())},
+            format="multipart",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_upload_not_an_image(self):
+        res = self.client.post(
+            self.url,
+            {"image": upload(b"GIF89a" + b"\0" * 1024)},
+            format="multipart",
+        )
+
+        self.assertRejected(res)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_upload_too_large(self):
+        content = image_bytes(size=(200, 200), image_format="BMP")
+
+        res = self.client.post(
+            self.url,
+            {"image": upload(content, name="image.bmp")},
+            format="multipart",
+        )
+
+        self.assertRejected(res)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=100)
+    def test_upload_too_many_pixels(self):
+        res = self.client.post(
+            self.url,
+            {"image": upload(image_bytes(size=(20, 20)))},
+            format="multipart",
+        )
+
+        self.assertRejected(res)